@@ -76,3 +76,50 @@ class WordPressAI(BaseAI):
     self.track_usage(tokens=1000, cost=0.03)
 
     return response
+
+
+# Example 3: Cheap model first, escalate only when the answer looks weak
+# (For LangChain agents the same idea lives in langchain/middleware-cascade.py)
+from concurrent.futures import ThreadPoolExecutor
+
+class CascadeAI(BaseAI):
+  def __init__(self, api_key, small_model="gpt-5-nano", large_model="gpt-5", threshold=0.7, parallel=False):
+    super().__init__(api_key)
+    self.small_model = small_model
+    self.large_model = large_model
+    self.threshold = threshold
+    self.parallel = parallel # start the large call alongside the small one - faster escalations, costs more
+    self.executor = ThreadPoolExecutor(max_workers=2)
+    self.usage_stats["escalations"] = 0
+    self.usage_stats["large_cancelled"] = 0 # large call never started
+    self.usage_stats["large_wasted"] = 0 # large call already running - still billed, result dropped
+
+  def _call_model(self, model, prompt):
+    # Here you would implement the actual call based on your provider...
+    return f"API response from {model}: "
+
+  def verify(self, prompt, response):
+    """Cheap confidence check - swap in logprobs or a tiny grader model if you have one"""
+    text = response.strip().lower()
+    if not text:
+      return 0.0
+    if any(p in text for p in ["i don't know", "i'm not sure", "i cannot", "unable to"]):
+      return 0.2
+    return 0.9
+
+  def _call_api(self, prompt):
+    if self.parallel:
+      large_future = self.executor.submit(self._call_model, self.large_model, prompt)
+      response = self._call_model(self.small_model, prompt)
+      if self.verify(prompt, response) >= self.threshold:
+        # cancel() fails once the call has started - use async clients for a true cancel
+        self.usage_stats["large_cancelled" if large_future.cancel() else "large_wasted"] += 1
+        return response
+      self.usage_stats["escalations"] += 1
+      return large_future.result()
+
+    response = self._call_model(self.small_model, prompt)
+    if self.verify(prompt, response) >= self.threshold:
+      return response
+    self.usage_stats["escalations"] += 1
+    return self._call_model(self.large_model, prompt)
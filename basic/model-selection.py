@@ -23,7 +23,10 @@ def use_model(task_type:str):
   return models[task_type]
 
 def model_by_complexity(complexity:int):
+  # high complexity gets the bigger model, simple tasks go to the cheap one
   if(complexity > 6):
-    return models["quick"]
-  else:
     return models["complex"]
+  else:
+    return models["quick"]
+
+# For routing on real token counts, latency and cost see langchain/middleware-model-router.py
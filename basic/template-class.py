@@ -1,12 +1,19 @@
 # Useful simple pattern for templatizing your prompts
 
+from string import Formatter
+
+import tiktoken
+
 class PromptTemplate:
   def __init__(self, template):
     self.template = template
 
   def format(self, **kwargs):
     return self.template.format(**kwargs)
-  
+
+  def compile(self, fields=None, model="gpt-3.5-turbo"):
+    return CompiledPromptTemplate(self.template, fields=fields, model=model)
+
 
 bug_fix_template = PromptTemplate("""
   Debug this {language} code:
@@ -15,4 +22,55 @@ bug_fix_template = PromptTemplate("""
   Provide: Explanation, fixed code, and future prevention tips                                                                                                      
   """)
 
-bug_fix_template.format(language="python", code=code, error=error) # these would be defined in real-world use
\ No newline at end of file
+bug_fix_template.format(language="python", code=code, error=error) # these would be defined in real-world use
+
+
+# For hot paths (same template rendered over and over) do the parsing work once up front
+
+class CompiledPromptTemplate:
+  def __init__(self, template, fields=None, model="gpt-3.5-turbo"):
+    self.template = template
+    self.encoding = tiktoken.encoding_for_model(model)
+
+    # Split into static text and placeholder slots once - rendering is then just a join
+    self.parts = []
+    self.slots = [] # (index into parts, field name)
+    for literal, field, spec, conversion in Formatter().parse(template):
+      if literal:
+        self.parts.append(literal)
+      if field is None:
+        continue
+      if not field.isidentifier() or spec or conversion:
+        raise ValueError(f"Only plain {{name}} placeholders can be compiled, got: {{{field}}}")
+      self.slots.append((len(self.parts), field))
+      self.parts.append("")
+
+    self.fields = {field for _, field in self.slots}
+
+    # Validate once here rather than on every render
+    if fields is not None:
+      missing = self.fields - set(fields)
+      extra = set(fields) - self.fields
+      if missing:
+        raise ValueError(f"Template uses fields that weren't declared: {sorted(missing)}")
+      if extra:
+        raise ValueError(f"Declared fields never used in template: {sorted(extra)}")
+
+    # Static text never changes, so tokenize it once
+    self.static_tokens = sum(len(self.encoding.encode(p)) for p in self.parts if p)
+
+  def format(self, **kwargs):
+    parts = self.parts.copy()
+    for index, field in self.slots:
+      parts[index] = str(kwargs[field])
+    return "".join(parts)
+
+  def count_tokens(self, **kwargs):
+    """Only the variables get tokenized - close to exact, token merges across part boundaries can shift it by a few"""
+    return self.static_tokens + sum(len(self.encoding.encode(str(kwargs[field]))) for _, field in self.slots)
+
+
+compiled_bug_fix = bug_fix_template.compile(fields=["language", "code", "error"])
+
+compiled_bug_fix.format(language="python", code=code, error=error)
+compiled_bug_fix.count_tokens(language="python", code=code, error=error) # e.g. to check against a budget before sending
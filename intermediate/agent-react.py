@@ -1,63 +1,166 @@
 # This demonstrates the principles behind a naive React agent architecture
 # IMPORTANT: not for production use
 
+# One LLM call per step: the model thinks, picks actions, and says whether it's done in a single structured reply.
+# Independent actions from the same step run concurrently instead of one tool per loop.
+
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+
+def estimate_tokens(text):
+  # rough rule of thumb - swap in tiktoken or your model's tokenizer if you need it exact
+  return len(text) // 4 + 1
+
+
+class AgentHistory:
+  """Keeps a running rendered buffer + token count so nothing gets re-joined from scratch every step.
+  Once over budget, the oldest steps collapse into a one line note and big observations are stored off to the side."""
+
+  def __init__(self, token_budget=3000, max_observation_tokens=500, count_tokens=estimate_tokens):
+    self.token_budget = token_budget
+    self.max_observation_tokens = max_observation_tokens
+    self.count_tokens = count_tokens
+    self.task = None # always kept
+    self.entries = [] # (text, tokens)
+    self.dropped_steps = 0
+    self.observations = {} # handle -> full observation text
+    self.rendered = ""
+    self.tokens = 0
+
+  def add(self, text):
+    if self.task is None:
+      self.task = text
+      self._rebuild()
+      return
+
+    tokens = self.count_tokens(text)
+    self.entries.append((text, tokens))
+    # Cheap path: just extend the buffer
+    self.rendered += ("\n" if self.rendered else "") + text
+    self.tokens += tokens
+
+    if self.tokens > self.token_budget:
+      self._window()
+
+  def add_observation(self, observation):
+    observation = str(observation)
+    if self.count_tokens(observation) > self.max_observation_tokens:
+      handle = f"obs-{len(self.observations) + 1}"
+      self.observations[handle] = observation
+      keep_chars = self.max_observation_tokens * 4
+      observation = f"{observation[:keep_chars]}... [truncated, full result: read_observation(handle=\"{handle}\")]"
+    self.add(f"Observation: {observation}")
+
+  def get_observation(self, handle):
+    """Exposed to the agent as a tool so it can pull back a truncated result if it really needs it"""
+    return self.observations.get(handle, f"No observation stored under {handle}")
+
+  def _window(self):
+    # Drop whole steps (everything up to the next Thought) from the front until we fit again
+    while self.entries and self.tokens > self.token_budget:
+      self.entries.pop(0)
+      while self.entries and not self.entries[0][0].startswith("Thought:"):
+        self.entries.pop(0)
+      self.dropped_steps += 1
+      self._rebuild()
+
+  def _rebuild(self):
+    lines = [self.task]
+    if self.dropped_steps:
+      lines.append(f"({self.dropped_steps} earlier steps omitted to save space)")
+    lines.extend(text for text, _ in self.entries)
+    self.rendered = "\n".join(lines)
+    self.tokens = sum(self.count_tokens(line) for line in lines[:len(lines) - len(self.entries)]) + sum(t for _, t in self.entries)
+
+  def render(self):
+    return self.rendered
+
+  def last(self):
+    return self.entries[-1][0] if self.entries else self.task
+
+
 class ReactAgent:
-  def __init__(self, llm, tools):
+  def __init__(self, llm, tools, max_steps=10, max_workers=4, token_budget=3000):
     self.llm = llm
-    self.tools = tools
-    self.history = []
+    self.history = AgentHistory(token_budget=token_budget)
+    self.tools = {**tools, "read_observation": self.history.get_observation} # dict of tool name -> callable
+    self.max_steps = max_steps
+    self.executor = ThreadPoolExecutor(max_workers=max_workers)
 
   def run(self, task):
-    self.history.append(f"task: {task}")
-    while not self.is_complete(task):
-      # Reason
-      thought = self.think()
-      self.history.append(f"Thought: {thought}")
+    self.history.add(f"task: {task}")
+    for _ in range(self.max_steps):
+      # Reason + decide + check completion in one round trip
+      step = self.step(task)
+      self.history.add(f"Thought: {step['thought']}")
 
-      # Decide on action
-      action = self.decide_action(thought)
-      self.history.append(f"Action: {action}")
+      if step["complete"]:
+        break
 
-      # Execute and Observe
-      observation = self.act(action)
-      self.history.append(f"Observation: {observation}")
+      # Execute and Observe - all actions from this step at once
+      observations = self.act(step["actions"])
+      for action, observation in zip(step["actions"], observations):
+        self.history.add(f"Action: {action['tool']}[{json.dumps(action['args'])}]")
+        self.history.add_observation(observation)
 
     return self.final_answer(task)
-  
-  def think(self):
-    prompt = f"""
-    {chr(10).join(self.history)} 
-    What should I do next? Think step-by-step.   
-    """
-    return self.llm.generate(prompt)
-  
-  def decide_action(self, thought):
+
+  def step(self, task):
     prompt = f"""
-    Based on this thought: {thought}
-    With these available tools: {self.tools}
-    What action should I take next?
-    Format: TOOLNAME[ARGS]
+    This is our goal: {task}
+    Work so far:
+    {self.history.render()}
+    Available tools: {list(self.tools)}
+
+    Think step-by-step about what to do next. If the goal is reached set complete to true.
+    Otherwise list every action that can run right now - actions in the same list must not depend on each other.
+    Respond with JSON only:
+    {{"thought": "...", "complete": true/false, "actions": [{{"tool": "TOOLNAME", "args": {{...}}}}]}}
     """
-    return self.llm.generate(prompt)
-  
-  def act(self, action):
-    """Implement logic for custom tool running"""
-    return "Result of the tool"
-  
+    return self.parse_step(self.llm.generate(prompt))
+
+  def parse_step(self, raw):
+    """Parse the model's JSON reply - fall back to a harmless 'not complete, no actions' step"""
+    try:
+      # Models love wrapping JSON in prose or code fences, so grab the outer braces
+      data = json.loads(raw[raw.index("{"):raw.rindex("}") + 1])
+    except ValueError:
+      return {"thought": raw, "complete": False, "actions": []}
+
+    actions = [
+      {"tool": a.get("tool"), "args": a.get("args") or {}}
+      for a in data.get("actions") or []
+      if isinstance(a, dict) and a.get("tool") in self.tools
+    ]
+    return {
+      "thought": data.get("thought", ""),
+      "complete": self.parse_bool(data.get("complete")),
+      "actions": actions,
+    }
+
+  def parse_bool(self, value):
+    # "false" is a non-empty string - don't let it count as done
+    if isinstance(value, str):
+      return value.strip().lower() in ["true", "yes", "1"]
+    return bool(value)
+
+  def act(self, actions):
+    """Run the step's tools concurrently, results come back in the same order as actions"""
+    futures = [self.executor.submit(self.run_tool, action) for action in actions]
+    return [future.result() for future in futures]
+
+  def run_tool(self, action):
+    try:
+      return self.tools[action["tool"]](**action["args"])
+    except Exception as e:
+      # Errors become observations so the model can recover on the next step
+      return f"Error: {e}"
+
   def final_answer(self, task):
     prompt = f"""
     This is our goal: {task}
-    Our final observation: {self.history[-1]}
+    Our final observation: {self.history.last()}
     Provide a summary of our findings
     """
     return self.llm.generate(prompt)
-  
-  def is_complete(self, task):
-    prompt = f"""
-    This is our goal: {task}
-    Work so far: {chr(10).join(self.history)}
-    Have we reached our goal yet?
-    Format: true / false
-    """
-    return self.llm.generate(prompt)
-    
\ No newline at end of file
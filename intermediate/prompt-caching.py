@@ -0,0 +1,137 @@
+# Assemble prompts so provider-side prompt caching actually hits
+
+# Both Anthropic (cache_control) and OpenAI (automatic prefix caching) only reuse an exact matching PREFIX.
+# One changing value near the top of a prompt (a user name, a date, retrieved docs...) means everything after it is a miss.
+# So: order segments from most stable -> least stable, and for Anthropic mark where the stable parts end.
+
+# REAL WORLD TIPS:
+# - Keep tool definitions and system prompts byte-for-byte identical between calls (no timestamps, no dict ordering surprises)
+# - Anthropic has a minimum cacheable length (~1024 tokens on most models, 2048 on Haiku) - smaller prefixes just won't cache
+# - If you're on LangChain + Anthropic there is a ready made AnthropicPromptCachingMiddleware in langchain_anthropic
+
+from anthropic import Anthropic
+
+# Stability tiers - lower number = changes less often = goes first
+STATIC = 0   # instructions, persona, output format - identical for every request
+SESSION = 1  # things fixed for a user/session - language, role, uploaded docs
+TURN = 2     # append-only history - the prefix of it stays stable turn to turn
+VOLATILE = 3 # the question, retrieved context, timestamps - new every call
+
+# Anthropic allows at most 4 cache breakpoints per request
+MAX_BREAKPOINTS = 4
+MIN_CACHEABLE_TOKENS = 1024
+
+
+def estimate_tokens(text):
+  # rough rule of thumb - swap in a real tokenizer if you need it exact
+  return len(text) // 4
+
+
+class PromptAssembler:
+  def __init__(self):
+    self.segments = []
+
+  def add(self, text, stability=VOLATILE, name=None):
+    """Add segments in any order - they get sorted by stability when rendered"""
+    self.segments.append({"name": name, "text": text, "stability": stability, "order": len(self.segments)})
+    return self
+
+  def ordered(self):
+    # stable sort keeps the order segments were added within the same tier
+    return sorted(self.segments, key=lambda s: (s["stability"], s["order"]))
+
+  def render(self, separator="\n\n"):
+    """Plain string - for OpenAI style prefix caching the ordering is all you need"""
+    return separator.join(s["text"] for s in self.ordered())
+
+  def to_anthropic_system(self):
+    """System blocks with cache_control set on the last block of each stable tier"""
+    ordered = self.ordered()
+    blocks = [{"type": "text", "text": s["text"]} for s in ordered]
+
+    # Breakpoints go where a tier ends - everything before that point is cached together
+    breakpoints = []
+    prefix_tokens = 0
+    for i, segment in enumerate(ordered):
+      prefix_tokens += estimate_tokens(segment["text"])
+      if segment["stability"] == VOLATILE:
+        break # never worth caching
+      tier_ends = i == len(ordered) - 1 or ordered[i + 1]["stability"] != segment["stability"]
+      if tier_ends and prefix_tokens >= MIN_CACHEABLE_TOKENS:
+        breakpoints.append(i)
+
+    # Over the limit? Keep the latest ones - a later breakpoint still covers the earlier prefix
+    for i in breakpoints[-MAX_BREAKPOINTS:]:
+      blocks[i]["cache_control"] = {"type": "ephemeral"}
+
+    return blocks
+
+
+class CacheUsageTracker:
+  """Collect cache read/write numbers off responses so you can see if caching is paying off"""
+
+  def __init__(self):
+    self.stats = {
+      "requests": 0,
+      "input_tokens": 0,
+      "cache_read_tokens": 0,
+      "cache_write_tokens": 0,
+    }
+
+  def record(self, response):
+    usage = response.usage
+    self.stats["requests"] += 1
+
+    if hasattr(usage, "cache_read_input_tokens"):
+      # Anthropic - input_tokens only counts the uncached part
+      self.stats["input_tokens"] += usage.input_tokens
+      self.stats["cache_read_tokens"] += usage.cache_read_input_tokens or 0
+      self.stats["cache_write_tokens"] += usage.cache_creation_input_tokens or 0
+    else:
+      # OpenAI - prompt_tokens includes the cached part, no separate write count
+      details = getattr(usage, "prompt_tokens_details", None)
+      cached = (getattr(details, "cached_tokens", 0) or 0) if details else 0
+      self.stats["input_tokens"] += usage.prompt_tokens - cached
+      self.stats["cache_read_tokens"] += cached
+
+    return response
+
+  def hit_rate(self):
+    total = self.stats["input_tokens"] + self.stats["cache_read_tokens"] + self.stats["cache_write_tokens"]
+    return self.stats["cache_read_tokens"] / total if total else 0.0
+
+  def report(self):
+    return {**self.stats, "hit_rate": round(self.hit_rate(), 3)}
+
+
+# --------------------------------
+# Example usage - RAG style prompt
+# --------------------------------
+
+if __name__ == "__main__":
+  client = Anthropic()
+  tracker = CacheUsageTracker()
+
+  instructions = "You are a helpful assistant. Use the retrieved context and prior conversation..." # long + static
+  history = ["User: Who wrote The Hobbit?\nAssistant: J.R.R. Tolkien."]
+
+  def ask(question, context):
+    prompt = PromptAssembler()
+    # Added in "natural" order - the assembler moves the volatile bits to the end
+    prompt.add(f"Context:\n{context}", VOLATILE, name="context")
+    prompt.add(instructions, STATIC, name="instructions")
+    prompt.add("Conversation so far:\n" + "\n".join(history), TURN, name="history")
+
+    response = client.messages.create(
+      model="claude-sonnet-4-5",
+      max_tokens=1000,
+      system=prompt.to_anthropic_system(),
+      messages=[{"role": "user", "content": question}],
+    )
+    tracker.record(response)
+    return response.content[0].text
+
+  ask("When was it published?", "The Hobbit was published in 1937...")
+  ask("Who published it?", "Allen & Unwin published The Hobbit...")
+
+  print(tracker.report())
@@ -3,6 +3,13 @@
 # REAL WORLD TIPS:
 # for efficiency - use a super small model to rewrite the prompt, then use a more powerful model to actually run the query
 
+import re
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import tiktoken
+
 from langchain_chroma import Chroma
 from langchain.prompts import ChatPromptTemplate
 from langchain_ollama import OllamaLLM
@@ -15,16 +22,28 @@ WIDTH = 60
 CHROMA_PATH = "chroma"
 MODEL = "qwen2:7b"
 
+# Token budget for everything we stuff into the answer prompt (history + retrieved context)
+# Whatever history doesn't use rolls over to retrieved context
+CONTEXT_BUDGET = 3000
+HISTORY_SHARE = 0.3
+CHUNK_SEPARATOR = "\n\n---\n\n"
+
+# Not the exact tokenizer for every local model, but close enough for budgeting
+encoding = tiktoken.get_encoding("cl100k_base")
+
+# Ordered most -> least stable (instructions, history, per-turn context) so prefix caching can reuse the start.
+# Only the instructions are a guaranteed hit: the history only grows by appending until pack_history starts
+# dropping turns - after that the oldest kept turn and the "(N earlier turns omitted...)" note change every turn.
 RAG_PROMPT = """
 You are a helpful assistant. Use the retrieved context and prior conversation
 to answer the user's latest question. Be concise and cite sources if relevant.
 
-Context:
-{context}
-
 Conversation so far:
 {history}
 
+Context:
+{context}
+
 User's question:
 {question}
 
@@ -54,28 +73,169 @@ Rewritten standalone query:
 """
 
 
-def build_prompt(history, context, question):
-    history_str = "\n".join([f"User: {h['question']}\nAssistant: {h['answer']}" for h in history])
-    prompt_template = ChatPromptTemplate.from_template(RAG_PROMPT)
-    return prompt_template.format(context=context, history=history_str, question=question)
+# Compile the templates once at import rather than on every call
+RAG_TEMPLATE = ChatPromptTemplate.from_template(RAG_PROMPT)
+REWRITE_TEMPLATE = ChatPromptTemplate.from_template(REWRITE_PROMPT)
+
+# Words that usually point back to earlier turns - if none show up the question can stand alone
+ANAPHORA_PATTERN = re.compile(
+    r"\b(it|its|they|them|their|this|that|these|those|he|him|his|she|her|there|then|"
+    r"same|above|previous|earlier|former|latter|more|also|else|other|another)\b"
+    r"|^(and|but|so|what about|how about)\b",
+    re.IGNORECASE,
+)
+
+REWRITE_CACHE_SIZE = 256
+rewrite_cache = OrderedDict()
+
+
+@lru_cache(maxsize=4096)
+def count_tokens(text):
+    """Cached - history turns and popular chunks get counted once, not every turn"""
+    return len(encoding.encode(text))
+
+
+def format_turn(turn):
+    return f"User: {turn['question']}\nAssistant: {turn['answer']}"
+
+
+def pack_history(history, budget):
+    """Keep the newest turns that fit, collapse anything older into a one line note"""
+    kept = []
+    used = 0
+    for turn in reversed(history):
+        turn_str = format_turn(turn)
+        tokens = count_tokens(turn_str)
+        if used + tokens > budget:
+            break
+        kept.append(turn_str)
+        used += tokens
+
+    dropped = len(history) - len(kept)
+    if dropped:
+        # Cheap stand-in for a summary - list the earlier questions if there's room, otherwise just the count
+        questions = "; ".join(h["question"] for h in history[:dropped])
+        for note in (f"({dropped} earlier turns omitted. Earlier questions: {questions})", f"({dropped} earlier turns omitted.)"):
+            note_tokens = count_tokens(note)
+            if used + note_tokens <= budget:
+                kept.append(note)
+                used += note_tokens
+                break
+
+    return "\n".join(reversed(kept)), used
+
+
+def is_duplicate(text, packed_texts, threshold=0.6):
+    """Splitters overlap chunks, so treat near-copies (by word shingles) as the same chunk"""
+    words = text.split()
+    shingles = {tuple(words[i:i + 5]) for i in range(max(len(words) - 4, 1))}
+    for other in packed_texts:
+        if text in other or other in text:
+            return True
+        other_words = other.split()
+        other_shingles = {tuple(other_words[i:i + 5]) for i in range(max(len(other_words) - 4, 1))}
+        overlap = len(shingles & other_shingles) / max(min(len(shingles), len(other_shingles)), 1)
+        if overlap >= threshold:
+            return True
+    return False
+
+
+def pack_context(results, budget):
+    """Greedily pack the closest chunks first (chroma scores are distances - lower is better)"""
+    packed = []
+    sources = []
+    seen_ids = set()
+    used = 0
+    separator_tokens = count_tokens(CHUNK_SEPARATOR)
+
+    for doc, _ in sorted(results, key=lambda pair: pair[1]):
+        doc_id = doc.metadata.get("id", None)
+        if doc_id is not None and doc_id in seen_ids:
+            continue
+        if is_duplicate(doc.page_content, packed):
+            continue
+
+        tokens = count_tokens(doc.page_content) + (separator_tokens if packed else 0)
+        if used + tokens > budget:
+            continue # a smaller chunk further down may still fit
+
+        packed.append(doc.page_content)
+        sources.append(doc_id)
+        seen_ids.add(doc_id)
+        used += tokens
+
+    return CHUNK_SEPARATOR.join(packed), sources
+
+
+def build_prompt(history, results, question, budget=CONTEXT_BUDGET):
+    """Pack history + retrieved chunks into a fixed token budget so prompt size stays flat over a session"""
+    history_str, history_used = pack_history(history, int(budget * HISTORY_SHARE))
+    context, sources = pack_context(results, budget - history_used)
+    prompt = RAG_TEMPLATE.format(context=context, history=history_str, question=question)
+    return prompt, sources
+
+
+def needs_rewrite(history, question):
+    """Cheap heuristic - only pay for an LLM rewrite when the question leans on earlier turns"""
+    if not history:
+        return False
+    return bool(ANAPHORA_PATTERN.search(question))
 
 
 def rewrite_query(llm, history, question):
+    # Fast path: first turn or a self-contained question goes straight to retrieval
+    if not needs_rewrite(history, question):
+        return question
+
     # Only use the last few user questions to alter query
     short_history = history[-2:]
+
+    # Memoize per (history window, question) - repeated follow ups skip the LLM round trip
+    cache_key = (tuple(h["question"] for h in short_history), question)
+    if cache_key in rewrite_cache:
+        rewrite_cache.move_to_end(cache_key)
+        return rewrite_cache[cache_key]
+
     history_str = "\n".join([f"User: {h['question']}" for h in short_history])
-    prompt_template = ChatPromptTemplate.from_template(REWRITE_PROMPT)
-    prompt = prompt_template.format(history=history_str, question=question)
+    prompt = REWRITE_TEMPLATE.format(history=history_str, question=question)
+    rewritten = llm.invoke(prompt).strip()
+
+    rewrite_cache[cache_key] = rewritten
+    if len(rewrite_cache) > REWRITE_CACHE_SIZE:
+        rewrite_cache.popitem(last=False)
+
+    return rewritten
 
-    return llm.invoke(prompt).strip()
 
+def merge_results(primary, speculative, k=5):
+    """Merge two result lists from similarity_search_with_score, de-duplicating by doc id (lower score = closer)"""
+    best = {}
+    for doc, score in primary + speculative:
+        key = doc.metadata.get("id", doc.page_content)
+        if key not in best or score < best[key][1]:
+            best[key] = (doc, score)
+    return sorted(best.values(), key=lambda pair: pair[1])[:k]
 
-def run_chat():
+
+def stream_answer(llm, prompt):
+    """Print tokens as they arrive and return the full answer once done"""
+    chunks = []
+    for chunk in llm.stream(prompt):
+        print(chunk, end="", flush=True)
+        chunks.append(chunk)
+    print()
+    return "".join(chunks)
+
+
+def run_chat(stream=True):
     # Prepare the DB once
     embedding_function = get_embedding_function()
     db = Chroma(persist_directory=CHROMA_PATH, embedding_function=embedding_function)
     llm = OllamaLLM(model=MODEL)
 
+    # Small pool so retrieval can run alongside the rewrite call
+    executor = ThreadPoolExecutor(max_workers=2)
+
     history = []
 
     print()
@@ -92,13 +252,18 @@ def run_chat():
         print()
 
         if query_text.lower() in ["exit", "quit", "q"]:
+            executor.shutdown(wait=False, cancel_futures=True)
             print('=' * WIDTH)
             print("👋 Goodbye!")
             print('=' * WIDTH)
             break
 
         with yaspin(text="Optimizing query...", color="cyan") as sp:
-            # Step 1: Rewrite query for retrieval
+            # Step 1: Speculatively search with the raw question while the rewrite runs
+            # Embedding + vector search is usually done before the LLM rewrite comes back
+            speculative = executor.submit(db.similarity_search_with_score, query_text, k=5)
+
+            # Step 2: Rewrite query for retrieval
             retrieval_query = rewrite_query(llm, history, query_text)
 
             sp.write("")
@@ -110,29 +275,40 @@ def run_chat():
 
             sp.text = "Retriving Information..."
 
-            # Step 2: Retrieve context with rewritten query
-            results = db.similarity_search_with_score(retrieval_query, k=5)
-            context_text = "\n\n---\n\n".join([doc.page_content for doc, _ in results])
-            sources = [doc.metadata.get("id", None) for doc, _ in results]
+            # Step 3: If the rewrite didn't change anything the speculative results are the answer,
+            # otherwise search again and merge so good raw-question hits aren't thrown away
+            speculative_results = speculative.result()
+            if retrieval_query.strip().lower() == query_text.lower():
+                results = speculative_results
+            else:
+                rewritten_results = db.similarity_search_with_score(retrieval_query, k=5)
+                results = merge_results(rewritten_results, speculative_results, k=5)
 
-            # Step 3: Build final answer prompt
-            prompt = build_prompt(history, context_text, query_text)
+            # Step 4: Build final answer prompt - packed into the token budget, sources are what made the cut
+            prompt, sources = build_prompt(history, results, query_text)
 
-            # Step 4: Model generates answer
+            # Stop the spinner before tokens start printing
+            sp.text = "Answer:"
+            sp.ok("✅")
+
+        # Step 5: Model generates answer - streamed so the first tokens show up right away
+        print()
+        if stream:
+            response_text = stream_answer(llm, prompt)
+        else:
             response_text = llm.invoke(prompt)
+            print(response_text)
+        print()
 
-            # Step 5: Save turn
-            history.append({"question": query_text, "answer": response_text})
+        # Step 6: Save turn
+        history.append({"question": query_text, "answer": response_text})
 
-            # Print result
-            sp.text = "Answer:"
-            sp.ok("✅")
-            print(f"\n{response_text}\n")
-            print('-' * WIDTH)
-            print(f"RAG Sources: \n{"\n".join(sources)}")
-            print('-' * WIDTH)
-            print()
+        # Print sources
+        print('-' * WIDTH)
+        print(f"RAG Sources: \n{"\n".join(str(s) for s in sources)}")
+        print('-' * WIDTH)
+        print()
 
 
 if __name__ == "__main__":
-    run_chat()
\ No newline at end of file
+    run_chat()
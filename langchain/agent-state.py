@@ -42,7 +42,7 @@ model = ChatOllama(model="llama3.1:8b", temperature=0)
 agent = create_agent(
     model=model,
     tools=[update_favourite_colour, read_favourite_colour],
-    checkpointer=InMemorySaver(),
+    checkpointer=InMemorySaver(), # grows forever - BoundedMemorySaver in langgraph/bounded-memory.py caps it
     state_schema=CustomState
 )
 
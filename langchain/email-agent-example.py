@@ -58,6 +58,7 @@ from langchain.agents.middleware import wrap_model_call, ModelRequest, ModelResp
 from typing import Callable
 
 # This boilerplate is messy, but it is what it is...
+# (middleware-tool-routing.py does the same with tool schemas converted once per route)
 @wrap_model_call
 def gated_tool_call(request: ModelRequest, handler: Callable[[ModelRequest], ModelResponse]) -> ModelResponse:
   """Only allow read/write if the user is authenticated"""
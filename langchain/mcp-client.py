@@ -1,58 +1,164 @@
 from langchain_mcp_adapters.client import MultiServerMCPClient
+from langchain_mcp_adapters.tools import load_mcp_tools
+from langchain_mcp_adapters.resources import load_mcp_resources
+from langchain_mcp_adapters.prompts import load_mcp_prompt
+from mcp.types import ToolListChangedNotification, ResourceListChangedNotification, PromptListChangedNotification
+from contextlib import AsyncExitStack
 import asyncio
+import time
 
-async def main():
-    client = MultiServerMCPClient(
-      {
-        "local_server": {
-          "transport": "stdio", # stdio or streamable_http depending on server
-          "command": "python",
-          "args": ["mcp-server.py"],
-        },
-        # Third party can be added as well
-        "time": {
-          "transport": "stdio",
-          "command": "uvx",
-          "args": [
+SERVERS = {
+    "local_server": {
+        "transport": "stdio", # stdio or streamable_http depending on server
+        "command": "python",
+        "args": ["mcp-server.py"],
+    },
+    # Third party can be added as well
+    "time": {
+        "transport": "stdio",
+        "command": "uvx",
+        "args": [
             "mcp-server-time",
             "--local-timezone=America/New_York"
-          ]
-        },
-        # example http
-        "travel_server": {
-          "transport": "streamable_http",
-          "url": "https://mcp.kiwi.com"
-        },
-        # Built in filesystem
-        "filesystem": {
-          "command": "npx",
-          "args": [
+        ]
+    },
+    # example http
+    "travel_server": {
+        "transport": "streamable_http",
+        "url": "https://mcp.kiwi.com"
+    },
+    # Built in filesystem
+    "filesystem": {
+        "transport": "stdio",
+        "command": "npx",
+        "args": [
             "-y",
             "@modelcontextprotocol/server-filesystem",
             "/Users/username/Desktop",
             "/path/to/other/allowed/dir"
-          ]
+        ]
+    }
+}
+
+
+# --------------------------------
+# Long-lived connection pool
+# --------------------------------
+
+# By default client.get_tools() returns tools that open a NEW session (and spawn a new stdio process) on every call.
+# The pool opens one session per server up front and keeps it warm, so agents reuse the same
+# subprocesses / HTTP sessions across invocations. Listings are cached until the TTL runs out
+# or the server tells us something changed (list_changed notifications).
+
+class MCPConnectionPool:
+    def __init__(self, servers, ttl=300):
+        self.servers = servers
+        self.ttl = ttl
+        self.sessions = {}
+        self.cache = {} # (kind, server, name) -> (expires_at, value)
+        self.stack = AsyncExitStack()
+
+        # Hook every session up to our notification handler for cache invalidation
+        connections = {
+            name: {**config, "session_kwargs": {**config.get("session_kwargs", {}), "message_handler": self._handler_for(name)}}
+            for name, config in servers.items()
         }
-      }
-    )
+        self.client = MultiServerMCPClient(connections)
+
+    def _handler_for(self, server):
+        async def handle(message):
+            notification = getattr(message, "root", None)
+            if isinstance(notification, ToolListChangedNotification):
+                self.invalidate("tools", server)
+            elif isinstance(notification, ResourceListChangedNotification):
+                self.invalidate("resources", server)
+            elif isinstance(notification, PromptListChangedNotification):
+                self.invalidate("prompt", server)
+        return handle
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def start(self):
+        # Open every session once, up front. This has to happen in the same task that later calls close() -
+        # the stdio/http transports use anyio cancel scopes that can't be exited from another task.
+        for name in self.servers:
+            self.sessions[name] = await self.stack.enter_async_context(self.client.session(name))
+
+    async def close(self):
+        await self.stack.aclose()
+        self.sessions.clear()
+        self.cache.clear()
+
+    async def session(self, server):
+        if server not in self.sessions:
+            raise KeyError(f"No open session for {server} - call start() first (or use the pool as a context manager)")
+        return self.sessions[server]
+
+    def invalidate(self, kind=None, server=None):
+        for key in list(self.cache):
+            if (kind is None or key[0] == kind) and (server is None or key[1] == server):
+                del self.cache[key]
+
+    async def _cached(self, key, load):
+        hit = self.cache.get(key)
+        if hit and hit[0] > time.monotonic():
+            return hit[1]
+        value = await load()
+        self.cache[key] = (time.monotonic() + self.ttl, value)
+        return value
+
+    async def get_tools(self, server=None):
+        """Tools are bound to the pooled session, so tool calls don't re-handshake either"""
+        if server is None:
+            tools = await asyncio.gather(*(self.get_tools(name) for name in self.servers))
+            return [t for server_tools in tools for t in server_tools]
+
+        async def load():
+            return await load_mcp_tools(await self.session(server))
+        return await self._cached(("tools", server, None), load)
+
+    async def get_resources(self, server):
+        async def load():
+            return await load_mcp_resources(await self.session(server))
+        return await self._cached(("resources", server, None), load)
+
+    async def get_prompt(self, server, name, arguments=None):
+        async def load():
+            return await load_mcp_prompt(await self.session(server), name, arguments=arguments)
+        # Only cache the argument-less form - prompts with arguments are cheap to render and vary per call
+        if arguments:
+            return await load()
+        return await self._cached(("prompt", server, name), load)
+
+
+async def main():
+    # Create the pool once per process and share it with every agent you build
+    async with MCPConnectionPool(SERVERS) as pool:
 
-    # get tools
-    tools = await client.get_tools()
+        # get tools
+        tools = await pool.get_tools()
 
-    # get resources
-    resources = await client.get_resources("local_server")
+        # get resources
+        resources = await pool.get_resources("local_server")
 
-    # get prompts
-    prompt = await client.get_prompt("local_server", "prompt")
-    prompt = prompt[0].content
+        # get prompts
+        prompt = await pool.get_prompt("local_server", "prompt")
+        prompt = prompt[0].content
 
-    print(tools)
-    print(resources)
-    print(prompt)
+        print(tools)
+        print(resources)
+        print(prompt)
 
-    # RUN YOUR ACTUAL AGENT CODE HERE
+        # RUN YOUR ACTUAL AGENT CODE HERE
+        # Repeat calls are served from the cache / warm sessions:
+        tools = await pool.get_tools()
 
     return
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    asyncio.run(main())
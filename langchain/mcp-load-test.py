@@ -0,0 +1,141 @@
+# Load test for the sample MCP server in HTTP mode
+# Spins up a fake Tavily (with made up latency), starts mcp-server.py pointed at it,
+# then replays tool calls from lots of simulated agents at once and reports latency + how often upstream was hit.
+
+#   python mcp-load-test.py --agents 50 --workers 4
+
+from mcp import ClientSession
+from mcp.client.streamable_http import streamablehttp_client
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import uvicorn
+
+
+# --------------------------------
+# Tavily stand-in
+# --------------------------------
+
+standin_stats = {"requests": 0}
+
+async def fake_search(request: Request):
+    body = await request.json()
+    standin_stats["requests"] += 1
+    await asyncio.sleep(random.uniform(0.2, 0.6)) # pretend to be a real search API
+    return JSONResponse({
+        "query": body["query"],
+        "results": [{"title": f"Result {i} for {body['query']}", "url": f"https://example.com/{i}", "content": "..."} for i in range(5)],
+    })
+
+def start_standin(port):
+    app = Starlette(routes=[Route("/search", fake_search, methods=["POST"])])
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    return server
+
+
+# --------------------------------
+# Simulated agents
+# --------------------------------
+
+# Small pool of queries so agents overlap - the same thing real agents do when they research similar topics
+QUERIES = [
+    "acf repeater field example",
+    "acf flexible content layout",
+    "register acf block json",
+    "acf gallery field return format",
+    "wordpress custom block attributes",
+    "acf options page setup",
+]
+
+async def simulated_agent(url, calls, latencies, errors):
+    try:
+        async with streamablehttp_client(url) as (read, write, _):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                for _ in range(calls):
+                    query = random.choice(QUERIES)
+                    start = time.perf_counter()
+                    await session.call_tool("search_web", {"query": query})
+                    latencies.append(time.perf_counter() - start)
+                    await asyncio.sleep(random.uniform(0, 0.1)) # "thinking" between calls
+    except Exception as e:
+        errors.append(e)
+
+async def wait_for_server(url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            async with streamablehttp_client(url) as (read, write, _):
+                async with ClientSession(read, write) as session:
+                    await session.initialize()
+                    return
+        except Exception:
+            await asyncio.sleep(0.5)
+    raise TimeoutError(f"MCP server never came up at {url}")
+
+async def run_load(url, agents, calls):
+    latencies = []
+    errors = []
+    start = time.perf_counter()
+    await asyncio.gather(*(simulated_agent(url, calls, latencies, errors) for _ in range(agents)))
+    return latencies, errors, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--agents", type=int, default=50)
+    parser.add_argument("--calls", type=int, default=10, help="tool calls per agent")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--standin-port", type=int, default=8766)
+    args = parser.parse_args()
+
+    start_standin(args.standin_port)
+
+    here = os.path.dirname(os.path.abspath(__file__))
+    cache_path = os.path.join(here, "mcp_load_test_cache.db")
+    if os.path.exists(cache_path):
+        os.remove(cache_path) # start cold every run
+
+    env = {**os.environ, "TAVILY_STANDIN_URL": f"http://127.0.0.1:{args.standin_port}/search"}
+    server = subprocess.Popen(
+        [sys.executable, "mcp-server.py", "--transport", "http", "--port", str(args.port),
+         "--workers", str(args.workers), "--cache-path", cache_path],
+        cwd=here,
+        env=env,
+    )
+
+    url = f"http://127.0.0.1:{args.port}/mcp"
+    try:
+        asyncio.run(wait_for_server(url))
+        latencies, errors, elapsed = asyncio.run(run_load(url, args.agents, args.calls))
+    finally:
+        server.terminate()
+        server.wait()
+
+    latencies.sort()
+    total = args.agents * args.calls
+    print()
+    print(f"Agents: {args.agents}  Calls/agent: {args.calls}  Workers: {args.workers}")
+    print(f"Completed calls: {len(latencies)}/{total}  Errors: {len(errors)}")
+    if latencies:
+        print(f"Throughput: {len(latencies) / elapsed:.1f} calls/s")
+        print(f"Latency p50: {statistics.median(latencies) * 1000:.0f}ms  p95: {latencies[int(len(latencies) * 0.95) - 1] * 1000:.0f}ms  max: {latencies[-1] * 1000:.0f}ms")
+    print(f"Upstream (stand-in) requests: {standin_stats['requests']} - everything else was served from cache")
+    if errors:
+        print(f"First error: {errors[0]!r}")
+
+
+if __name__ == "__main__":
+    main()
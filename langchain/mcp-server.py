@@ -5,39 +5,186 @@ from dotenv import load_dotenv
 load_dotenv()
 
 from mcp.server.fastmcp import FastMCP
-from tavily import TavilyClient
+from tavily import AsyncTavilyClient
 from typing import Dict, Any
-from requests import get
+import argparse
+import asyncio
+import httpx
+import json
+import os
+import sqlite3
+import time
 
 
 # MCP allows for tools, prompts, and resources
 
 mcp = FastMCP("sample_mcp_server") # Name your MCP server
 
-tavily_client = TavilyClient()
+# Point searches at a local stand-in instead of Tavily (used by mcp-load-test.py)
+TAVILY_STANDIN_URL = os.environ.get("TAVILY_STANDIN_URL")
+
+tavily_client = None if TAVILY_STANDIN_URL else AsyncTavilyClient()
+
+# One pooled async HTTP client for the whole server - connections get reused across sessions
+http_client = httpx.AsyncClient(
+    timeout=httpx.Timeout(10.0),
+    limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+    follow_redirects=True,
+)
+
+# Cap how many outbound calls run at once so a burst of agents can't swamp upstream APIs
+outbound_limit = asyncio.Semaphore(8)
+
+
+# --------------------------------
+# Simple TTL cache
+# --------------------------------
+
+class TTLCache:
+    def __init__(self, ttl, max_items=1000):
+        self.ttl = ttl
+        self.max_items = max_items
+        self.items = {} # key -> (expires_at, value)
+
+    def get(self, key):
+        hit = self.items.get(key)
+        if hit and hit[0] > time.monotonic():
+            return hit[1]
+        return None
+
+    def peek(self, key):
+        """Return the value even if expired - handy for conditional GETs"""
+        hit = self.items.get(key)
+        return hit[1] if hit else None
+
+    def set(self, key, value):
+        if len(self.items) >= self.max_items and key not in self.items:
+            # drop the entry closest to expiring
+            del self.items[min(self.items, key=lambda k: self.items[k][0])]
+        self.items[key] = (time.monotonic() + self.ttl, value)
+
+
+# With several HTTP workers each process has its own memory, so share caches through a small SQLite file instead.
+# Local SQLite reads/writes are sub-millisecond, cheap enough to do inline.
+class SharedTTLCache(TTLCache):
+    def __init__(self, path, namespace, ttl, max_items=1000):
+        super().__init__(ttl, max_items)
+        self.namespace = namespace
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=5)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS cache (ns TEXT, key TEXT, expires_at REAL, value TEXT, PRIMARY KEY (ns, key))")
+        self.conn.commit()
+
+    def _row(self, key):
+        return self.conn.execute("SELECT expires_at, value FROM cache WHERE ns = ? AND key = ?", (self.namespace, key)).fetchone()
+
+    def get(self, key):
+        row = self._row(key)
+        # wall clock here - monotonic time isn't comparable across processes
+        if row and row[0] > time.time():
+            return json.loads(row[1])
+        return None
+
+    def peek(self, key):
+        row = self._row(key)
+        return json.loads(row[1]) if row else None
+
+    def set(self, key, value):
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)",
+                (self.namespace, key, time.time() + self.ttl, json.dumps(value))
+            )
+            self.conn.execute(
+                "DELETE FROM cache WHERE ns = ? AND key NOT IN (SELECT key FROM cache WHERE ns = ? ORDER BY expires_at DESC LIMIT ?)",
+                (self.namespace, self.namespace, self.max_items)
+            )
+
+
+SHARED_CACHE_PATH = os.environ.get("MCP_SHARED_CACHE")
+
+if SHARED_CACHE_PATH:
+    search_cache = SharedTTLCache(SHARED_CACHE_PATH, "search", ttl=15 * 60)
+    resource_cache = SharedTTLCache(SHARED_CACHE_PATH, "resource", ttl=60 * 60)
+else:
+    search_cache = TTLCache(ttl=15 * 60)
+    resource_cache = TTLCache(ttl=60 * 60)
+
+# Identical searches that arrive at the same time share one upstream call
+in_flight = {}
 
 
 # Tool for searching the web
 @mcp.tool()
-def search_web(query: str) -> Dict[str, Any]:
+async def search_web(query: str) -> Dict[str, Any]:
     """Search the web for information"""
 
-    results = tavily_client.search(query)
+    key = " ".join(query.lower().split())
+    cached = search_cache.get(key)
+    if cached is not None:
+        return cached
+
+    if key not in in_flight:
+        async def run_search():
+            try:
+                async with outbound_limit:
+                    if TAVILY_STANDIN_URL:
+                        resp = await http_client.post(TAVILY_STANDIN_URL, json={"query": query})
+                        resp.raise_for_status()
+                        results = resp.json()
+                    else:
+                        results = await tavily_client.search(query)
+                search_cache.set(key, results)
+                return results
+            finally:
+                del in_flight[key]
+        in_flight[key] = asyncio.create_task(run_search())
+
+    # shield - one caller being cancelled mustn't cancel the search the others are waiting on
+    return await asyncio.shield(in_flight[key])
+
+
+async def fetch_cached(url):
+    """GET with a TTL cache, revalidated with ETag / Last-Modified once the TTL runs out"""
+    cached = resource_cache.get(url)
+    if cached is not None:
+        return cached["text"]
+
+    stale = resource_cache.peek(url)
+    headers = {}
+    if stale:
+        if stale.get("etag"):
+            headers["If-None-Match"] = stale["etag"]
+        if stale.get("last_modified"):
+            headers["If-Modified-Since"] = stale["last_modified"]
 
-    return results
+    async with outbound_limit:
+        resp = await http_client.get(url, headers=headers)
+
+    if resp.status_code == 304 and stale:
+        # Unchanged upstream - just push the expiry out
+        resource_cache.set(url, stale)
+        return stale["text"]
+
+    resp.raise_for_status()
+    resource_cache.set(url, {
+        "text": resp.text,
+        "etag": resp.headers.get("ETag"),
+        "last_modified": resp.headers.get("Last-Modified"),
+    })
+    return resp.text
 
 
 # Resources - provide access to langchain-ai repo files
 @mcp.resource("https://github.com/StoutLogic/acf-builder-wiki/blob/master/Field-Types.md")
-def acf_readme():
+async def acf_readme():
     """
     Resource for accessing ACF Field Types Readme file
 
     """
     url = f"https://github.com/StoutLogic/acf-builder-wiki/blob/master/Field-Types.md"
     try:
-        resp = get(url)
-        return resp.text
+        return await fetch_cached(url)
     except Exception as e:
         return f"Error: {str(e)}"
 
@@ -61,5 +208,52 @@ def prompt():
     You may also ask clarifying questions to the user to better understand their question.
     """
 
+# --------------------------------
+# Streamable HTTP deployment
+# --------------------------------
+
+# stdio = one client per server process. Over HTTP one process serves many sessions,
+# and with --workers several processes share the port (and the SQLite caches above).
+# Multiple workers need stateless mode - any worker can then answer any request, no sticky sessions required.
+#
+#   python mcp-server.py                                  # stdio, for local agents
+#   python mcp-server.py --transport http --port 8000     # one process, many sessions
+#   python mcp-server.py --transport http --workers 4     # multi-worker, shared caches
+#
+# Clients connect with {"transport": "streamable_http", "url": "http://localhost:8000/mcp"}
+
+def create_app():
+    if os.environ.get("MCP_STATELESS"):
+        mcp.settings.stateless_http = True
+    return mcp.streamable_http_app()
+
+
 if __name__ == "__main__":
-    mcp.run(transport="stdio")
\ No newline at end of file
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--transport", choices=["stdio", "http"], default="stdio")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--cache-path", default="mcp_cache.db")
+    args = parser.parse_args()
+
+    if args.transport == "stdio":
+        mcp.run(transport="stdio")
+    elif args.workers == 1:
+        mcp.settings.host = args.host
+        mcp.settings.port = args.port
+        mcp.run(transport="streamable-http")
+    else:
+        import uvicorn
+
+        # Worker processes re-import this file, so hand the settings over through the environment
+        os.environ["MCP_SHARED_CACHE"] = os.path.abspath(args.cache_path)
+        os.environ["MCP_STATELESS"] = "1"
+        uvicorn.run(
+            "mcp-server:create_app", # importlib is fine with the dash in the file name
+            factory=True,
+            app_dir=os.path.dirname(os.path.abspath(__file__)),
+            host=args.host,
+            port=args.port,
+            workers=args.workers,
+        )
\ No newline at end of file
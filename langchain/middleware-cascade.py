@@ -0,0 +1,181 @@
+from langchain.agents import create_agent
+from langchain.agents.middleware import AgentMiddleware, ModelRequest, ModelResponse
+from langchain.chat_models import init_chat_model
+from langchain.messages import AIMessage, HumanMessage
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable
+from difflib import SequenceMatcher
+import asyncio
+import math
+import re
+
+
+# CHEAP MODEL FIRST CASCADE
+
+# Same idea as the tip in rag-query-rewrites.py, but for every call: most requests are easy,
+# so let the small model answer, check the answer cheaply, and only pay for the large model
+# when the check fails.
+#
+# mode="sequential" - small first, large only on escalation (cheapest)
+# mode="parallel"   - start both, return small if it passes and cancel large (lowest latency, pays for some large calls)
+
+
+# --------------------------------
+# Verifiers - return a confidence between 0 and 1
+# --------------------------------
+
+UNSURE_PHRASES = ["i don't know", "i'm not sure", "i am not sure", "i cannot", "i can't help", "as an ai", "unable to"]
+
+def heuristic_verifier(message: AIMessage, request: ModelRequest) -> float:
+    """No extra calls - catches empty, refusing or hedging answers and bad tool calls"""
+    if message.tool_calls:
+        # Tool calls are structured - just make sure they point at tools that exist
+        known = {getattr(t, "name", None) for t in request.tools}
+        return 1.0 if all(call["name"] in known for call in message.tool_calls) else 0.0
+
+    text = message.text.strip().lower()
+    if not text:
+        return 0.0
+    if any(phrase in text for phrase in UNSURE_PHRASES):
+        return 0.2
+    if len(text) < 20:
+        return 0.6 # short isn't wrong, but it's a weaker signal
+    return 0.9
+
+def logprob_verifier(message: AIMessage, request: ModelRequest) -> float:
+    """Average token probability - needs a model created with logprobs=True (OpenAI style metadata)"""
+    tokens = (message.response_metadata.get("logprobs") or {}).get("content") or []
+    if not tokens:
+        return heuristic_verifier(message, request)
+    return math.exp(sum(t["logprob"] for t in tokens) / len(tokens))
+
+def normalize_answer(text: str) -> str:
+    # Case, punctuation and spacing differences shouldn't count as disagreement
+    return " ".join(re.sub(r"[^\w\s]", " ", text.lower()).split())
+
+def self_consistency_verifier(samples: int = 2, similarity: float = 0.8) -> Callable:
+    """Re-ask the small model and compare answers - agreement = confidence. Costs extra small-model calls.
+    Two free-text answers agree when their normalized text is at least `similarity` alike (difflib ratio)."""
+    def agreement(message, others):
+        answer = normalize_answer(message.text)
+        return sum(SequenceMatcher(None, answer, normalize_answer(o.text)).ratio() >= similarity for o in others) / samples
+
+    def verify(message: AIMessage, request: ModelRequest, handler: Callable) -> float:
+        if message.tool_calls:
+            return heuristic_verifier(message, request)
+        return agreement(message, [handler(request).result[0] for _ in range(samples)])
+
+    async def averify(message: AIMessage, request: ModelRequest, handler: Callable) -> float:
+        if message.tool_calls:
+            return heuristic_verifier(message, request)
+        responses = await asyncio.gather(*(handler(request) for _ in range(samples)))
+        return agreement(message, [r.result[0] for r in responses])
+
+    verify.needs_handler = True
+    verify.averify = averify
+    return verify
+
+
+# --------------------------------
+# Middleware
+# --------------------------------
+
+class CascadeMiddleware(AgentMiddleware):
+    def __init__(self, small_model, large_model, verifier=heuristic_verifier, threshold=0.7, mode="sequential"):
+        super().__init__()
+        self.small = init_chat_model(small_model) if isinstance(small_model, str) else small_model
+        self.large = init_chat_model(large_model) if isinstance(large_model, str) else large_model
+        self.verifier = verifier
+        self.threshold = threshold
+        self.mode = mode
+        self.executor = ThreadPoolExecutor(max_workers=4)
+        # large_cancelled = large call stopped in time, large_wasted = it ran (and was billed) but the small answer won
+        self.stats = {"calls": 0, "escalations": 0, "large_cancelled": 0, "large_wasted": 0}
+
+    def _message(self, response):
+        return next((m for m in response.result if isinstance(m, AIMessage)), None)
+
+    def _confidence(self, response, request, handler):
+        message = self._message(response)
+        if message is None:
+            return 0.0
+        if getattr(self.verifier, "needs_handler", False):
+            return self.verifier(message, request, handler)
+        return self.verifier(message, request)
+
+    async def _aconfidence(self, response, request, handler):
+        message = self._message(response)
+        if message is None:
+            return 0.0
+        if getattr(self.verifier, "needs_handler", False):
+            return await self.verifier.averify(message, request, handler)
+        return self.verifier(message, request)
+
+    def _drop_large(self, large):
+        # cancel() is False once the call has started (threads) or finished (tasks) - that one is paid for
+        self.stats["large_cancelled" if large.cancel() else "large_wasted"] += 1
+
+    def wrap_model_call(self, request: ModelRequest, handler: Callable[[ModelRequest], ModelResponse]) -> ModelResponse:
+        self.stats["calls"] += 1
+        small_request = request.override(model=self.small)
+        large_request = request.override(model=self.large)
+
+        if self.mode == "parallel":
+            large_future = self.executor.submit(handler, large_request)
+            small_response = handler(small_request)
+            if self._confidence(small_response, small_request, handler) >= self.threshold:
+                # A running thread can't be interrupted - usually this only drops the result (use ainvoke for a real cancel)
+                self._drop_large(large_future)
+                return small_response
+            self.stats["escalations"] += 1
+            return large_future.result()
+
+        small_response = handler(small_request)
+        if self._confidence(small_response, small_request, handler) >= self.threshold:
+            return small_response
+        self.stats["escalations"] += 1
+        return handler(large_request)
+
+    async def awrap_model_call(self, request: ModelRequest, handler) -> ModelResponse:
+        self.stats["calls"] += 1
+        small_request = request.override(model=self.small)
+        large_request = request.override(model=self.large)
+
+        large_task = asyncio.create_task(handler(large_request)) if self.mode == "parallel" else None
+        try:
+            small_response = await handler(small_request)
+            confident = await self._aconfidence(small_response, small_request, handler) >= self.threshold
+        except Exception:
+            if large_task is None:
+                raise
+            confident = False
+
+        if confident:
+            if large_task is not None:
+                self._drop_large(large_task) # actually stops the in-flight request, unless it already finished
+            return small_response
+
+        self.stats["escalations"] += 1
+        return await large_task if large_task is not None else await handler(large_request)
+
+
+# Example
+cascade = CascadeMiddleware(
+    small_model="gpt-5-nano",
+    large_model="claude-sonnet-4-5",
+    verifier=heuristic_verifier,
+    threshold=0.7,
+    mode="sequential",
+)
+
+agent = create_agent(
+    model="gpt-5-nano",
+    middleware=[cascade],
+    system_prompt="You are a helpful assistant."
+)
+
+if __name__ == "__main__":
+    for question in ["What's the capital of France?", "Prove there are infinitely many primes of the form 4k+3."]:
+        response = agent.invoke({"messages": [HumanMessage(content=question)]})
+        print(response["messages"][-1].response_metadata.get("model_name"), "->", response["messages"][-1].content[:80])
+    print(cascade.stats)
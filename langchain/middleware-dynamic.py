@@ -81,6 +81,7 @@ def sql_query(query: str) -> str:
     except Exception as e:
         return f"Error: {e}"
 
+# (middleware-tool-routing.py does the same with tool schemas converted once per route)
 @wrap_model_call
 def dynamic_tool_call(request: ModelRequest, 
 handler: Callable[[ModelRequest], ModelResponse]) -> ModelResponse:
@@ -0,0 +1,165 @@
+from langchain.agents import create_agent
+from langchain.agents.middleware import AgentMiddleware, ModelRequest, ModelResponse
+from langchain.chat_models import init_chat_model
+from langchain.messages import HumanMessage
+from langchain_core.messages.utils import count_tokens_approximately
+from collections import deque
+from typing import Callable
+import asyncio
+import threading
+import time
+
+
+# COST + LATENCY AWARE MODEL ROUTING
+
+# state_based_model (middleware-dynamic.py) upgrades once there are more than 10 messages - message count says
+# very little about context size, and nothing about cost or how slow a model is running right now.
+# This router picks the CHEAPEST model that:
+#   1. fits the request's actual token count (+ room for the answer) in its context window
+#   2. has recently been answering within the latency SLO
+#   3. isn't saturated (too many calls in flight / cooling down after errors)
+# and falls through to the next candidate automatically if a call fails.
+
+# Prices are USD per 1M tokens - check your provider's pricing page, these go stale fast
+MODELS = {
+    "gpt-5-nano": {"context_limit": 400_000, "input_cost": 0.05, "output_cost": 0.40, "max_in_flight": 50},
+    "gpt-4o-mini": {"context_limit": 128_000, "input_cost": 0.15, "output_cost": 0.60, "max_in_flight": 50},
+    "claude-sonnet-4-5": {"context_limit": 200_000, "input_cost": 3.00, "output_cost": 15.00, "max_in_flight": 20},
+}
+
+
+class ModelStats:
+    """Rolling window of observed latencies for one model"""
+
+    def __init__(self, window=50):
+        self.latencies = deque(maxlen=window)
+        self.output_tokens = deque(maxlen=window)
+        self.in_flight = 0
+        self.cooldown_until = 0.0
+
+    def record(self, seconds, output_tokens):
+        self.latencies.append(seconds)
+        self.output_tokens.append(output_tokens)
+
+    def p95(self):
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        return ordered[max(int(len(ordered) * 0.95) - 1, 0)]
+
+    def throughput(self):
+        """Output tokens per second - handy for debugging which model is actually fast"""
+        total_time = sum(self.latencies)
+        return sum(self.output_tokens) / total_time if total_time else None
+
+
+class ModelRouterMiddleware(AgentMiddleware):
+    def __init__(self, models=MODELS, latency_slo=10.0, reserve_output_tokens=2000, error_cooldown=30.0):
+        super().__init__()
+        self.models = models
+        self.clients = {name: init_chat_model(name) for name in models}
+        self.stats = {name: ModelStats() for name in models}
+        self.latency_slo = latency_slo
+        self.reserve_output_tokens = reserve_output_tokens
+        self.error_cooldown = error_cooldown
+        self.lock = threading.Lock()
+
+    def estimate_cost(self, name, input_tokens):
+        spec = self.models[name]
+        return (input_tokens * spec["input_cost"] + self.reserve_output_tokens * spec["output_cost"]) / 1_000_000
+
+    def candidates(self, request):
+        """Models to try, best first"""
+        messages = ([request.system_message] if request.system_message else []) + request.messages
+        input_tokens = count_tokens_approximately(messages, tools=request.tools)
+        needed = input_tokens + self.reserve_output_tokens
+        now = time.monotonic()
+
+        fits = [name for name, spec in self.models.items() if spec["context_limit"] >= needed]
+        if not fits:
+            raise ValueError(f"No model has room for ~{needed} tokens - trim or summarize the conversation first")
+
+        def available(name):
+            stats = self.stats[name]
+            return stats.in_flight < self.models[name]["max_in_flight"] and stats.cooldown_until <= now
+
+        def within_slo(name):
+            p95 = self.stats[name].p95()
+            return p95 is None or p95 <= self.latency_slo # no data yet = give it a chance
+
+        by_cost = sorted(fits, key=lambda name: self.estimate_cost(name, input_tokens))
+        preferred = [n for n in by_cost if available(n) and within_slo(n)]
+        # Nothing meets the SLO? Fastest available first, then anything that fits as a last resort
+        slow = sorted([n for n in by_cost if available(n) and n not in preferred], key=lambda n: self.stats[n].p95() or 0)
+        saturated = [n for n in by_cost if n not in preferred and n not in slow]
+        return preferred + slow + saturated
+
+    def _start(self, name):
+        with self.lock:
+            self.stats[name].in_flight += 1
+        return time.monotonic()
+
+    def _finish(self, name, started, response=None):
+        with self.lock:
+            stats = self.stats[name]
+            stats.in_flight -= 1
+            if response is None:
+                stats.cooldown_until = time.monotonic() + self.error_cooldown
+                return
+            usage = getattr(response.result[0], "usage_metadata", None) or {}
+            stats.record(time.monotonic() - started, usage.get("output_tokens", 0))
+
+    def wrap_model_call(self, request: ModelRequest, handler: Callable[[ModelRequest], ModelResponse]) -> ModelResponse:
+        last_error = None
+        for name in self.candidates(request):
+            started = self._start(name)
+            try:
+                response = handler(request.override(model=self.clients[name]))
+            except Exception as e:
+                # Rate limited / overloaded / down - cool this model off and fall back to the next one
+                self._finish(name, started)
+                last_error = e
+                continue
+            self._finish(name, started, response)
+            return response
+        raise last_error
+
+    async def awrap_model_call(self, request: ModelRequest, handler) -> ModelResponse:
+        last_error = None
+        for name in self.candidates(request):
+            started = self._start(name)
+            try:
+                response = await handler(request.override(model=self.clients[name]))
+            except asyncio.CancelledError:
+                # Cancelled by the caller, not the model's fault - no cooldown
+                with self.lock:
+                    self.stats[name].in_flight -= 1
+                raise
+            except Exception as e:
+                self._finish(name, started)
+                last_error = e
+                continue
+            self._finish(name, started, response)
+            return response
+        raise last_error
+
+    def report(self):
+        return {
+            name: {"p95": stats.p95(), "tokens_per_second": stats.throughput(), "in_flight": stats.in_flight}
+            for name, stats in self.stats.items()
+        }
+
+
+# Example call - same intern as middleware-dynamic.py, now on whatever is cheapest and fast enough
+router = ModelRouterMiddleware(latency_slo=8.0)
+
+agent = create_agent(
+    model="gpt-5-nano",
+    middleware=[router],
+    system_prompt="You are roleplaying a real life helpful office intern."
+)
+
+if __name__ == "__main__":
+    response = agent.invoke({"messages": [HumanMessage(content="Can you grab me a coffee?")]})
+    print(response["messages"][-1].response_metadata.get("model_name"))
+    print(router.report())
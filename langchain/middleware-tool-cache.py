@@ -0,0 +1,171 @@
+from langchain.agents import create_agent, AgentState
+from langchain.agents.middleware import AgentMiddleware
+from langchain.messages import HumanMessage, ToolMessage
+from langchain.tools import tool, ToolRuntime
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.types import Command
+import json
+import logging
+import time
+
+
+# TOOL RESULT MEMOIZATION
+
+# Agents happily call the same read-only tool with the same args several times in one thread
+# (check_inbox, web_search, sql_query, read_favourite_colour...). Each repeat pays full tool latency.
+# This middleware answers repeats from a cache - only for tools you mark as pure/read-only -
+# and clears the cache whenever a tool that writes (send_email, update_favourite_colour...) runs.
+
+logger = logging.getLogger("tool_cache")
+
+
+class ToolCacheMiddleware(AgentMiddleware):
+    def __init__(self, pure_tools: dict[str, float], write_tools: dict[str, list[str] | None] | None = None, scope: str = "thread", max_items: int = 1000):
+        """
+        pure_tools: tool name -> TTL in seconds for tools that are safe to cache
+        write_tools: tool name -> list of pure tools it invalidates (None = invalidate everything in scope)
+        scope: "thread" keeps caches per thread_id, "global" shares results across threads
+        """
+        super().__init__()
+        self.pure_tools = pure_tools
+        self.write_tools = write_tools or {}
+        self.scope = scope
+        self.max_items = max_items
+        self.cache = {} # (scope_key, tool, args) -> (expires_at, content)
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0}
+
+    # ------ helpers ------
+
+    def _scope_key(self, request):
+        if self.scope == "global":
+            return "global"
+        config = getattr(request.runtime, "config", None) or {}
+        return config.get("configurable", {}).get("thread_id", "global")
+
+    def _normalize(self, args):
+        # Same call with different whitespace / key order should hit the same entry
+        def clean(value):
+            if isinstance(value, str):
+                return " ".join(value.split())
+            if isinstance(value, dict):
+                return {k: clean(v) for k, v in value.items()}
+            if isinstance(value, list):
+                return [clean(v) for v in value]
+            return value
+        return json.dumps(clean(args), sort_keys=True, default=str)
+
+    def _key(self, request):
+        call = request.tool_call
+        return (self._scope_key(request), call["name"], self._normalize(call.get("args", {})))
+
+    def _lookup(self, key, tool_call_id):
+        hit = self.cache.get(key)
+        if not hit or hit[0] < time.monotonic():
+            self.stats["misses"] += 1
+            return None
+        self.stats["hits"] += 1
+        logger.info("tool cache hit: %s %s", key[1], key[2])
+        # Fresh ToolMessage each time - the tool_call_id has to match the current call
+        return ToolMessage(content=hit[1], name=key[1], tool_call_id=tool_call_id, response_metadata={"cache_hit": True})
+
+    def _store(self, key, result):
+        # Only cache successful plain results - Commands update state and must always run
+        if not isinstance(result, ToolMessage) or result.status == "error":
+            return
+        if len(self.cache) >= self.max_items:
+            del self.cache[min(self.cache, key=lambda k: self.cache[k][0])]
+        self.cache[key] = (time.monotonic() + self.pure_tools[key[1]], result.content)
+
+    def _invalidate(self, request):
+        scope_key = self._scope_key(request)
+        targets = self.write_tools[request.tool_call["name"]]
+        for key in list(self.cache):
+            if (self.scope == "global" or key[0] == scope_key) and (targets is None or key[1] in targets):
+                del self.cache[key]
+                self.stats["invalidations"] += 1
+
+    # ------ middleware hooks ------
+
+    def wrap_tool_call(self, request, handler):
+        name = request.tool_call["name"]
+
+        if name in self.pure_tools:
+            key = self._key(request)
+            cached = self._lookup(key, request.tool_call["id"])
+            if cached is not None:
+                return cached
+            result = handler(request)
+            self._store(key, result)
+            return result
+
+        result = handler(request)
+        if name in self.write_tools:
+            self._invalidate(request)
+        return result
+
+    async def awrap_tool_call(self, request, handler):
+        name = request.tool_call["name"]
+
+        if name in self.pure_tools:
+            key = self._key(request)
+            cached = self._lookup(key, request.tool_call["id"])
+            if cached is not None:
+                return cached
+            result = await handler(request)
+            self._store(key, result)
+            return result
+
+        result = await handler(request)
+        if name in self.write_tools:
+            self._invalidate(request)
+        return result
+
+
+# --------------------------------
+# Example - favourite colour agent
+# --------------------------------
+
+# Same getter / setter pair as agent-state.py
+# (For the email agent: pure_tools={"check_inbox": 60}, write_tools={"send_email": ["check_inbox"]})
+
+class CustomState(AgentState):
+    favourite_colour: str
+
+@tool
+def update_favourite_colour(favourite_colour: str, runtime: ToolRuntime) -> Command:
+    """Update the favourite colour of the user in the state once they've revealed it."""
+    return Command(update={
+        "favourite_colour": favourite_colour,
+        "messages": [ToolMessage("Successfully updated favourite colour", tool_call_id=runtime.tool_call_id)]}
+    )
+
+@tool
+def read_favourite_colour(runtime: ToolRuntime) -> str:
+    """Read the favourite colour of the user from the state."""
+    time.sleep(1) # pretend this is slow
+    return runtime.state.get("favourite_colour", "No favourite colour found in state")
+
+
+tool_cache = ToolCacheMiddleware(
+    pure_tools={"read_favourite_colour": 300},
+    write_tools={"update_favourite_colour": ["read_favourite_colour"]},
+    scope="thread",
+)
+
+agent = create_agent(
+    model="gpt-5-nano",
+    tools=[update_favourite_colour, read_favourite_colour],
+    checkpointer=InMemorySaver(),
+    state_schema=CustomState,
+    middleware=[tool_cache],
+)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    config = {"configurable": {"thread_id": "1"}}
+
+    for question in ["My favourite colour is green", "What's my favourite colour?", "Remind me, what's my favourite colour?"]:
+        response = agent.invoke({"messages": [HumanMessage(content=question)]}, config)
+        print(response["messages"][-1].content)
+
+    print(tool_cache.stats) # second read should be a hit
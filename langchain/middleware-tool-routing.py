@@ -0,0 +1,123 @@
+from langchain.agents import create_agent
+from langchain.agents.middleware import AgentMiddleware, ModelRequest, ModelResponse
+from langchain.messages import HumanMessage
+from langchain.tools import tool
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from dataclasses import dataclass
+from typing import Any, Callable, Hashable
+import json
+
+
+# PRECOMPUTED TOOL ROUTING
+
+# gated_tool_call (email agent) and dynamic_tool_call (middleware-dynamic.py) hand BaseTools to the model,
+# so every model call converts each tool's pydantic schema to JSON schema again.
+# The tool schemas also sit at the very START of the provider request - if the subset (or its order)
+# wobbles between calls the whole prompt cache misses.
+# Here every route's tools are sorted by name and converted to OpenAI tool dicts once, and those dicts
+# are what the model gets (ModelRequest.tools takes dicts) - no per-call conversion, same bytes every call.
+# Execution is unaffected: the agent's tool node still runs the real tools by name.
+
+
+def estimate_tokens(text):
+    # rough rule of thumb - swap in tiktoken if you need it exact
+    return len(text) // 4
+
+
+class ToolRouterMiddleware(AgentMiddleware):
+    def __init__(self, routes: dict[Hashable, list], route_key: Callable[[ModelRequest], Hashable]):
+        """
+        routes: route key (role, auth state...) -> tools allowed for that route
+        route_key: picks the route for a request - keep it cheap, it runs on every model call
+        """
+        super().__init__()
+        self.route_key = route_key
+        self.routes = {}
+        self.schema_tokens = {}
+
+        converted = {} # tool name -> schema dict, so a tool shared by routes is converted once
+        for key, tools in routes.items():
+            for t in tools:
+                if t.name not in converted:
+                    converted[t.name] = convert_to_openai_tool(t)
+            # Stable order = stable bytes = cacheable prefix
+            self.routes[key] = [converted[t.name] for t in sorted(tools, key=lambda t: t.name)]
+            self.schema_tokens[key] = estimate_tokens(json.dumps(self.routes[key]))
+
+        self.full_schema_tokens = estimate_tokens(json.dumps([converted[name] for name in sorted(converted)]))
+        # schema_tokens_trimmed = tokens not sent compared with giving every route every tool
+        self.stats = {"calls": 0, "schema_tokens_sent": 0, "schema_tokens_trimmed": 0, "by_route": {}}
+
+    def _route(self, request):
+        key = self.route_key(request)
+        tools = self.routes[key]
+
+        self.stats["calls"] += 1
+        self.stats["schema_tokens_sent"] += self.schema_tokens[key]
+        self.stats["schema_tokens_trimmed"] += self.full_schema_tokens - self.schema_tokens[key]
+        self.stats["by_route"][key] = self.stats["by_route"].get(key, 0) + 1
+
+        # Precomputed schema dicts - nothing is converted per call
+        return request.override(tools=tools)
+
+    def wrap_model_call(self, request: ModelRequest, handler: Callable[[ModelRequest], ModelResponse]) -> ModelResponse:
+        return handler(self._route(request))
+
+    async def awrap_model_call(self, request: ModelRequest, handler) -> ModelResponse:
+        return await handler(self._route(request))
+
+    def report(self):
+        return {
+            **self.stats,
+            "full_schema_tokens": self.full_schema_tokens,
+            "route_schema_tokens": self.schema_tokens,
+        }
+
+
+# --------------------------------
+# Example - role based tools (middleware-dynamic.py)
+# --------------------------------
+
+@dataclass
+class UserRole:
+    user_role: str = "external"
+
+@tool
+def web_search(query: str) -> dict[str, Any]:
+    """Search the web for information"""
+    return {"results": f"Results for {query}"} # tavily_client.search(query) in real use
+
+@tool
+def sql_query(query: str) -> str:
+    """Obtain information from the database using SQL queries"""
+    return "query results" # db.run(query) in real use
+
+
+tool_router = ToolRouterMiddleware(
+    routes={
+        "internal": [web_search, sql_query], # internal users get access to all tools
+        "external": [web_search], # external users only get access to web search
+    },
+    route_key=lambda request: request.runtime.context.user_role,
+)
+
+# Same idea for the email agent:
+# ToolRouterMiddleware(
+#     routes={True: [check_inbox, send_email], False: [authenticate]},
+#     route_key=lambda request: bool(request.state.get("authenticated")),
+# )
+
+agent = create_agent(
+    model="gpt-5-nano",
+    tools=[web_search, sql_query],
+    middleware=[tool_router],
+    context_schema=UserRole,
+)
+
+if __name__ == "__main__":
+    response = agent.invoke(
+        {"messages": [HumanMessage(content="What's the weather in Paris?")]},
+        context=UserRole(user_role="external"),
+    )
+    print(response["messages"][-1].content)
+    print(tool_router.report())
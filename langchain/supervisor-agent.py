@@ -9,6 +9,8 @@ from langchain_ollama import ChatOllama
 from langgraph.checkpoint.memory import InMemorySaver
 from langchain.messages import HumanMessage, ToolMessage
 from langchain_mcp_adapters.client import MultiServerMCPClient
+from langchain_mcp_adapters.tools import load_mcp_tools
+from contextlib import AsyncExitStack
 from tavily import TavilyClient
 from typing import Dict, Any
 import asyncio
@@ -37,6 +39,10 @@ class WeddingState(AgentState):
   year: str
 
 async def main():
+  async with AsyncExitStack() as client_stack:
+    await run(client_stack)
+
+async def run(client_stack):
 
   # MCP Client
   client = MultiServerMCPClient(
@@ -48,7 +54,10 @@ async def main():
     }
   )
 
-  mcp_tools = await client.get_tools()
+  # Keep one session open for the whole run - tools from client.get_tools() open a fresh
+  # session (and handshake) on every single tool call. See mcp-client.py for a full pool with caching.
+  travel_session = await client_stack.enter_async_context(client.session("travel_server"))
+  mcp_tools = await load_mcp_tools(travel_session)
 
   # Tool Declarations
 
@@ -120,29 +129,79 @@ async def main():
   # Orchestrator Agent
 
   # First, create tooling for our subagents
+  # All specialist calls use ainvoke so nothing blocks the event loop
+
+  # Per-subagent limits - timeout in seconds, recursion_limit caps how many steps a specialist can burn
+  subagent_limits = {
+    "flights": {"timeout": 120, "recursion_limit": 15},
+    "venues": {"timeout": 90, "recursion_limit": 10},
+    "flowers": {"timeout": 60, "recursion_limit": 10},
+  }
+
+  async def run_specialist(name, agent, request):
+    """Run one specialist with its timeout and step budget - failures come back as text rather than raising"""
+    limits = subagent_limits[name]
+    try:
+      response = await asyncio.wait_for(
+        agent.ainvoke(
+          {"messages": [HumanMessage(content=request)]},
+          {"recursion_limit": limits["recursion_limit"]}
+        ),
+        timeout=limits["timeout"]
+      )
+      return name, response['messages'][-1].content
+    except asyncio.TimeoutError:
+      return name, f"{name} specialist timed out after {limits['timeout']}s"
+    except Exception as e:
+      return name, f"{name} specialist failed: {e}"
+
+  def flights_request(state):
+    return f"Find flights from {state['origin']} to {state['destination']} in the year {state['year']}"
+
+  def venues_request(state):
+    return f"Find a wedding venue in {state['destination']} with capacity for {state['guest_count']} guests."
+
+  def flowers_request(state):
+    return f"Find flowers that match the following colors: {state['colors']}"
+
   @tool
   async def search_flights(runtime: ToolRuntime) -> str:
     """Travel agent searches from flights from origin to desired wedding location"""
-    origin = runtime.state["origin"]
-    destination = runtime.state["destination"]
-    year = runtime.state["year"]
-    response = await travel_agent.ainvoke({"messages": [HumanMessage(content=f"Find flights from {origin} to {destination} in the year {year}")]})
-    return response['messages'][-1].content
+    _, result = await run_specialist("flights", travel_agent, flights_request(runtime.state))
+    return result
   
   @tool
-  def search_venues(runtime: ToolRuntime) -> str:
+  async def search_venues(runtime: ToolRuntime) -> str:
     """Chooses a venue based on location and guest capacity"""
-    capacity = runtime.state["guest_count"]
-    destination = runtime.state["destination"]
-    response = venue_agent.invoke({"messages": [HumanMessage(content=f"Find a wedding venue in {destination} with capacity for {capacity} guests.")]})
-    return response['messages'][-1].content
+    _, result = await run_specialist("venues", venue_agent, venues_request(runtime.state))
+    return result
   
   @tool
-  def pick_flowers(runtime: ToolRuntime) -> str:
+  async def pick_flowers(runtime: ToolRuntime) -> str:
     """Florist agent will pick flowers based on colors"""
-    colors = runtime.state["colors"]
-    response = florist_agent.invoke({"messages": [HumanMessage(content=f"Find flowers that match the following colors: {colors}")]})
-    return response['messages'][-1].content
+    _, result = await run_specialist("flowers", florist_agent, flowers_request(runtime.state))
+    return result
+
+  # Fan-out: the specialists don't depend on each other, so run them all at once
+  # Total time is the slowest specialist instead of the sum of all three
+  @tool
+  async def delegate_all(runtime: ToolRuntime) -> str:
+    """Send flights, venues and flowers to all specialists at the same time. Use once the state has been updated."""
+    state = runtime.state
+    tasks = [
+      asyncio.create_task(run_specialist("flights", travel_agent, flights_request(state))),
+      asyncio.create_task(run_specialist("venues", venue_agent, venues_request(state))),
+      asyncio.create_task(run_specialist("flowers", florist_agent, flowers_request(state))),
+    ]
+
+    results = {}
+    for finished in asyncio.as_completed(tasks):
+      name, result = await finished
+      results[name] = result
+      # Stream each result out as soon as it lands (shows up under stream_mode="custom")
+      runtime.stream_writer({"specialist": name, "result": result})
+
+    return "\n\n".join(f"## {name.title()}\n{results[name]}" for name in subagent_limits)
 
   @tool
   def updateState(origin: str, destination: str, guest_count: str, colors: str, year:str, runtime: ToolRuntime) -> str:
@@ -159,12 +218,14 @@ async def main():
 
   orchestrator = create_agent(
     model=model,
-    tools=[search_flights, search_venues, pick_flowers, updateState],
+    tools=[delegate_all, search_flights, search_venues, pick_flowers, updateState],
     state_schema=WeddingState,
+    # For a persistent store that doesn't block the loop see CoalescingAsyncSaver in langgraph/async-storage.py
     checkpointer=InMemorySaver(),
     system_prompt="""
     You are a wedding coordinator. Delegate tasks to your specialists for flights, venues, and flowers.
-    First find all the information you need to update the state. Once that is done you can delegate the tasks.
+    First find all the information you need to update the state. Once that is done use delegate_all to send every task at once.
+    Only use the individual specialist tools to retry one that failed.
     Once you have received their answers, Show me all the details for the wedding.
     """
   )
@@ -172,10 +233,17 @@ async def main():
 
 
 # Workflow Runner
-  response = await orchestrator.ainvoke(
+  # Stream so specialist results show up as they finish instead of all at the end
+  response = None
+  async for mode, chunk in orchestrator.astream(
     {"messages": [HumanMessage(content="I'm from London and I'd like a wedding in Paris for 100 guests in 2026, with blue and red as the color palette")]},
-    {"configurable": {"thread_id": "1"}}
-  )
+    {"configurable": {"thread_id": "1"}},
+    stream_mode=["custom", "values"]
+  ):
+    if mode == "custom":
+      print(f"✅ {chunk['specialist']} finished")
+    else:
+      response = chunk
 
 
   print(response)
@@ -52,19 +52,160 @@ sys_msg = SystemMessage(content="You are a helpful assistant tasked with perform
 def assistant(state: MessagesState):
    return {"messages": [llm_with_tools.invoke([sys_msg] + state["messages"])]}
 
+# --------------------------------------------
+# Tool node that runs tool calls side by side
+# --------------------------------------------
+
+# When the model asks for several tools at once they should all run together:
+# - sync tools go to a shared thread pool, async tools run natively on the event loop (ainvoke / astream)
+# - a per-tool semaphore caps how many calls of one tool run at once (rate limited APIs...)
+# - a per-tool timeout turns a hung tool into an error message instead of stalling the whole step.
+#   A sync tool's thread can't be killed though: after a timeout it keeps its pool thread and its
+#   semaphore slot until the tool returns. The per-tool limit bounds how many of those pile up -
+#   once they're all stuck, new calls of that tool wait for a slot and time out in turn.
+# - tools get the node's config, so callbacks / tracing / run metadata carry through
+# - each result is streamed out the moment it finishes (stream_mode="custom"),
+#   then all of them go back to the assistant in the original call order
+
+import asyncio
+import time
+import weakref
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from threading import BoundedSemaphore
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.runnables import RunnableLambda
+from langchain_core.tools import BaseTool, tool as as_tool
+from langgraph.config import get_stream_writer
+
+class ParallelToolNode(RunnableLambda):
+    def __init__(self, tools, max_workers=8, limits=None, timeouts=None, default_limit=4, default_timeout=30.0):
+        """
+        limits: tool name -> max concurrent calls of that tool (default_limit otherwise)
+        timeouts: tool name -> seconds before the call is reported as failed (default_timeout otherwise)
+        """
+        self.tools = {t.name: t for t in (t if isinstance(t, BaseTool) else as_tool(t) for t in tools)}
+        self.pool = ThreadPoolExecutor(max_workers=max_workers)
+        self.limits = {name: (limits or {}).get(name, default_limit) for name in self.tools}
+        self.timeouts = {name: (timeouts or {}).get(name, default_timeout) for name in self.tools}
+        self.thread_slots = {name: BoundedSemaphore(n) for name, n in self.limits.items()}
+        self.async_slots = weakref.WeakKeyDictionary() # event loop -> tool name -> asyncio.Semaphore
+        super().__init__(self._run, afunc=self._arun, name="tools")
+
+    # ------ helpers ------
+
+    def _calls(self, state):
+        message = state["messages"][-1]
+        return message.tool_calls if isinstance(message, AIMessage) else []
+
+    def _error(self, call, text):
+        return ToolMessage(content=f"Error: {text}", name=call["name"], tool_call_id=call["id"], status="error")
+
+    def _emit(self, writer, message):
+        if writer:
+            writer({"tool_result": message})
+
+    def _unknown(self, call):
+        return self._error(call, f"{call['name']} is not a valid tool, try one of {list(self.tools)}")
+
+    def _call_tool(self, call, config):
+        tool = self.tools[call["name"]]
+        with self.thread_slots[call["name"]]:
+            try:
+                if getattr(tool, "func", None) is None and getattr(tool, "coroutine", None) is not None:
+                    # async-only tool on the sync path - give it its own loop in this worker thread
+                    return asyncio.run(tool.ainvoke({**call, "type": "tool_call"}, config))
+                return tool.invoke({**call, "type": "tool_call"}, config)
+            except Exception as e:
+                return self._error(call, repr(e))
+
+    def _async_slots(self, name):
+        # asyncio semaphores belong to the loop that first waits on them - keep one set per loop
+        slots = self.async_slots.setdefault(asyncio.get_running_loop(), {})
+        if name not in slots:
+            slots[name] = asyncio.Semaphore(self.limits[name])
+        return slots[name]
+
+    def _writer(self):
+        try:
+            return get_stream_writer()
+        except (RuntimeError, KeyError):
+            return None # called outside a graph
+
+    # ------ sync: thread pool ------
+
+    def _run(self, state, config):
+        calls = self._calls(state)
+        writer = self._writer()
+        results = [None] * len(calls)
+        futures = {}
+        for i, call in enumerate(calls):
+            if call["name"] in self.tools:
+                futures[self.pool.submit(self._call_tool, call, config)] = i
+            else:
+                results[i] = self._unknown(call)
+                self._emit(writer, results[i])
+        now = time.monotonic()
+        deadlines = {f: now + self.timeouts[calls[i]["name"]] for f, i in futures.items()}
+
+        pending = set(futures)
+        while pending:
+            next_deadline = min(deadlines[f] for f in pending)
+            done, pending = wait(pending, timeout=max(next_deadline - time.monotonic(), 0), return_when=FIRST_COMPLETED)
+            for f in done:
+                results[futures[f]] = f.result()
+                self._emit(writer, results[futures[f]])
+            now = time.monotonic()
+            for f in [f for f in pending if deadlines[f] <= now]:
+                # A running thread can't be killed - its result is dropped, it holds its slot until it returns
+                f.cancel()
+                pending.discard(f)
+                call = calls[futures[f]]
+                results[futures[f]] = self._error(call, f"{call['name']} timed out after {self.timeouts[call['name']]}s")
+                self._emit(writer, results[futures[f]])
+        return {"messages": results}
+
+    # ------ async: native for async tools, pool for sync ones ------
+
+    async def _acall_tool(self, call, writer, config):
+        tool = self.tools.get(call["name"])
+        if tool is None:
+            result = self._unknown(call)
+        else:
+            try:
+                async with self._async_slots(call["name"]):
+                    if getattr(tool, "coroutine", None) is not None:
+                        work = tool.ainvoke({**call, "type": "tool_call"}, config)
+                    else:
+                        # sync tool - run it in the pool so it doesn't block the loop (a timeout can't stop the thread)
+                        work = asyncio.get_running_loop().run_in_executor(self.pool, tool.invoke, {**call, "type": "tool_call"}, config)
+                    result = await asyncio.wait_for(work, self.timeouts[call["name"]])
+            except asyncio.TimeoutError:
+                result = self._error(call, f"{call['name']} timed out after {self.timeouts[call['name']]}s")
+            except Exception as e:
+                result = self._error(call, repr(e))
+        self._emit(writer, result)
+        return result
+
+    async def _arun(self, state, config):
+        writer = self._writer()
+        results = await asyncio.gather(*(self._acall_tool(call, writer, config) for call in self._calls(state)))
+        return {"messages": list(results)}
+
+
+
 # --------------------------------------------
 # Build the Graph
 # --------------------------------------------
 
 from langgraph.graph import START, StateGraph
-from langgraph.prebuilt import tools_condition, ToolNode
+from langgraph.prebuilt import tools_condition
 
 
 builder = StateGraph(MessagesState)
 
 # Define nodes: these do the work
 builder.add_node("assistant", assistant)
-builder.add_node("tools", ToolNode(tools))
+builder.add_node("tools", ParallelToolNode(tools, timeouts={"divide": 5.0}))
 
 # Define edges: these determine how the control flow moves
 builder.add_edge(START, "assistant")
@@ -85,6 +226,14 @@ memory = MemorySaver()
 react_graph_with_memory = builder.compile(checkpointer=memory)
 
 
+# --------------------------------------------
+# Streaming
+# --------------------------------------------
+
+# Tokens, node updates and each tool result as it finishes - see streaming.py
+from streaming import stream_graph, astream_graph
+
+
 # --------------------------------------------
 # Test it
 # --------------------------------------------
@@ -96,12 +245,22 @@ config = {"configurable": {"thread_id": "1"}}
 messages = [HumanMessage(content="Add 3 and 4.")]
 
 # Run
-messages = react_graph_memory.invoke({"messages": messages},config)
+messages = react_graph_with_memory.invoke({"messages": messages},config)
 for m in messages['messages']:
     m.pretty_print()
 
 # Now run again and ensure memory works
 messages = [HumanMessage(content="Multiply that by 2.")]
-messages = react_graph_memory.invoke({"messages": messages}, config)
+messages = react_graph_with_memory.invoke({"messages": messages}, config)
 for m in messages['messages']:
-    m.pretty_print()
\ No newline at end of file
+    m.pretty_print()
+
+# Same again, streamed - tokens and tool results show up as they happen
+messages = [HumanMessage(content="Now divide that by 7.")]
+for event in stream_graph(react_graph_with_memory, {"messages": messages}, config):
+    if event["type"] == "token":
+        print(event["text"], end="", flush=True)
+    elif event["type"] == "custom":
+        print(f"\n[tool] {event['data']['tool_result'].content}")
+    else:
+        print(f"\n[{event['node']} done]")
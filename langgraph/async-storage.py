@@ -0,0 +1,492 @@
+# --------------------------------------------
+# Async persistent checkpointer with write coalescing
+# --------------------------------------------
+
+# InMemorySaver is fast but forgets everything on restart, and the sync SqliteSaver blocks the
+# event loop on every graph step. This saver sits in between:
+# - hot threads live in an in-memory InMemorySaver (bounded LRU) so reads never touch disk
+# - writes land in memory immediately and are queued; everything queued during one event-loop
+#   tick goes to disk as ONE batch in the background
+# - fsync happens per batch, on a timer, or never - your call on durability vs speed
+# - if the disk falls behind (or fails), writers wait / get the error instead of memory growing without limit
+# - cold threads get loaded back from disk the first time they're touched
+#
+# Two backends: aiosqlite, or plain append-only files (no extra dependency), compacted on load
+
+import asyncio
+import logging
+import os
+import pickle
+import struct
+import threading
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+import aiosqlite
+from langgraph.checkpoint.base import WRITES_IDX_MAP, BaseCheckpointSaver
+from langgraph.checkpoint.memory import InMemorySaver
+
+from thread_files import thread_path, unpickle, write_atomic
+
+logger = logging.getLogger("async_storage")
+
+
+# Records passed to backends - already serialized, backends just store bytes
+# ("checkpoint", thread_id, ns, checkpoint_id, parent_id, (type, bytes), (type, bytes))
+# ("blob", thread_id, ns, channel, version, (type, bytes))
+# ("write", thread_id, ns, checkpoint_id, task_id, idx, channel, (type, bytes), task_path)
+
+
+class AioSqliteBackend:
+    def __init__(self, path):
+        self.path = path
+        self.db = None
+        self.lock = None
+
+    async def open(self, fsync):
+        # One connection - writes, loads and the fsync timer take turns on it
+        self.lock = asyncio.Lock()
+        self.db = await aiosqlite.connect(self.path)
+        await self.db.execute("PRAGMA journal_mode=WAL")
+        # FULL = fsync every commit, NORMAL = fsync at WAL checkpoints (see sync() below)
+        await self.db.execute(f"PRAGMA synchronous={'FULL' if fsync == 'batch' else 'NORMAL'}")
+        await self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS checkpoints (
+                thread_id TEXT, checkpoint_ns TEXT, checkpoint_id TEXT, parent_id TEXT,
+                type TEXT, checkpoint BLOB, metadata_type TEXT, metadata BLOB,
+                PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+            );
+            CREATE TABLE IF NOT EXISTS blobs (
+                thread_id TEXT, checkpoint_ns TEXT, channel TEXT, version TEXT, type TEXT, blob BLOB,
+                PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+            );
+            CREATE TABLE IF NOT EXISTS writes (
+                thread_id TEXT, checkpoint_ns TEXT, checkpoint_id TEXT, task_id TEXT, idx INTEGER,
+                channel TEXT, type TEXT, value BLOB, task_path TEXT,
+                PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+            );
+        """)
+        await self.db.commit()
+
+    async def write(self, records):
+        async with self.lock:
+            await self._write(records)
+
+    async def _write(self, records):
+        checkpoints = [(r[1], r[2], r[3], r[4], *r[5], *r[6]) for r in records if r[0] == "checkpoint"]
+        blobs = [(r[1], r[2], r[3], r[4], *r[5]) for r in records if r[0] == "blob"]
+        writes = [(r[1], r[2], r[3], r[4], r[5], r[6], *r[7], r[8]) for r in records if r[0] == "write"]
+        # One transaction for the whole batch
+        await self.db.executemany("INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)", checkpoints)
+        await self.db.executemany("INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?, ?)", blobs)
+        await self.db.executemany("INSERT OR REPLACE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", writes)
+        await self.db.commit()
+
+    async def sync(self):
+        async with self.lock:
+            await self.db.execute("PRAGMA wal_checkpoint(PASSIVE)")
+
+    async def load(self, thread_id):
+        async with self.lock:
+            return await self._load(thread_id)
+
+    async def _load(self, thread_id):
+        records = []
+        async with self.db.execute("SELECT * FROM checkpoints WHERE thread_id = ?", (thread_id,)) as cur:
+            async for t, ns, cid, parent, type_, ckpt, meta_type, meta in cur:
+                records.append(("checkpoint", t, ns, cid, parent, (type_, ckpt), (meta_type, meta)))
+        async with self.db.execute("SELECT * FROM blobs WHERE thread_id = ?", (thread_id,)) as cur:
+            async for t, ns, channel, version, type_, blob in cur:
+                records.append(("blob", t, ns, channel, version, (type_, blob)))
+        async with self.db.execute("SELECT * FROM writes WHERE thread_id = ?", (thread_id,)) as cur:
+            async for t, ns, cid, task_id, idx, channel, type_, value, task_path in cur:
+                records.append(("write", t, ns, cid, task_id, idx, channel, (type_, value), task_path))
+        return records
+
+    async def delete(self, thread_id):
+        async with self.lock:
+            for table in ["checkpoints", "blobs", "writes"]:
+                await self.db.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+            await self.db.commit()
+
+    async def close(self):
+        await self.db.close()
+
+
+def record_key(record):
+    """What a record overwrites - same key = INSERT OR REPLACE in the sqlite backend"""
+    if record[0] == "write":
+        return record[:6]
+    return record[:5]
+
+
+class FileBackend:
+    """One append-only log file per thread. File IO runs in a worker thread so the loop never blocks.
+
+    Only the `max_open_files` most recently written logs keep an open handle. Logs are compacted when a
+    thread is loaded - duplicate records (a retried batch) and a torn tail (a crash mid-write) are dropped.
+    """
+
+    def __init__(self, directory, max_open_files=64):
+        self.directory = directory
+        self.max_open_files = max_open_files
+        self.files = OrderedDict() # thread_id -> append handle, in LRU order
+        self.unsynced = set() # threads written since the last fsync
+        self.fsync = "interval"
+        self.lock = threading.Lock() # writes, loads and syncs run in different worker threads
+        self.stats = {"compactions": 0}
+
+    async def open(self, fsync):
+        os.makedirs(self.directory, exist_ok=True)
+        self.fsync = fsync
+
+    def _path(self, thread_id):
+        return thread_path(self.directory, thread_id, ".log")
+
+    def _close(self, thread_id):
+        f = self.files.pop(thread_id, None)
+        if f is None:
+            return
+        if thread_id in self.unsynced and self.fsync != "never":
+            os.fsync(f.fileno()) # the interval sync can't reach it once it's closed
+        self.unsynced.discard(thread_id)
+        f.close()
+
+    def _handle(self, thread_id):
+        f = self.files.get(thread_id)
+        if f is None:
+            while len(self.files) >= self.max_open_files:
+                self._close(next(iter(self.files)))
+            f = self.files[thread_id] = open(self._path(thread_id), "ab")
+        self.files.move_to_end(thread_id)
+        return f
+
+    def _write_sync(self, records):
+        by_thread = {}
+        for record in records:
+            by_thread.setdefault(record[1], []).append(record)
+        for thread_id, thread_records in by_thread.items():
+            f = self._handle(thread_id)
+            f.write(b"".join(self._frame(record) for record in thread_records))
+            f.flush()
+            if self.fsync == "batch":
+                os.fsync(f.fileno())
+            else:
+                self.unsynced.add(thread_id)
+
+    def _locked(self, fn, *args):
+        with self.lock:
+            return fn(*args)
+
+    async def write(self, records):
+        await asyncio.to_thread(self._locked, self._write_sync, records)
+
+    def _sync_sync(self):
+        for thread_id in list(self.unsynced):
+            if thread_id in self.files:
+                os.fsync(self.files[thread_id].fileno())
+        self.unsynced.clear()
+
+    async def sync(self):
+        await asyncio.to_thread(self._locked, self._sync_sync)
+
+    @staticmethod
+    def _frame(record):
+        data = pickle.dumps(record)
+        return struct.pack(">I", len(data)) + data
+
+    def _load_sync(self, thread_id):
+        path = self._path(thread_id)
+        if not os.path.exists(path):
+            return []
+        self._close(thread_id) # about to be rewritten - don't append through a stale handle
+        latest = {}
+        count = 0
+        with open(path, "rb") as f:
+            data = f.read()
+        offset = 0
+        while offset + 4 <= len(data):
+            (size,) = struct.unpack_from(">I", data, offset)
+            if offset + 4 + size > len(data):
+                break # torn write at the tail from a crash - drop it
+            record = unpickle(data[offset + 4:offset + 4 + size])
+            latest.pop(record_key(record), None) # keep the newest copy, in write order
+            latest[record_key(record)] = record
+            count += 1
+            offset += 4 + size
+
+        records = list(latest.values())
+        # Compact: the next append must not land after a torn tail, and retried batches leave duplicates
+        if offset < len(data) or len(records) < count:
+            write_atomic(path, b"".join(self._frame(record) for record in records))
+            self.stats["compactions"] += 1
+        return records
+
+    async def load(self, thread_id):
+        return await asyncio.to_thread(self._locked, self._load_sync, thread_id)
+
+    def _delete_sync(self, thread_id):
+        f = self.files.pop(thread_id, None)
+        if f:
+            f.close()
+        self.unsynced.discard(thread_id)
+        path = self._path(thread_id)
+        if os.path.exists(path):
+            os.remove(path)
+
+    async def delete(self, thread_id):
+        await asyncio.to_thread(self._locked, self._delete_sync, thread_id)
+
+    def _close_all(self):
+        for thread_id in list(self.files):
+            self._close(thread_id)
+
+    async def close(self):
+        await asyncio.to_thread(self._locked, self._close_all)
+
+
+class CoalescingAsyncSaver(BaseCheckpointSaver):
+    def __init__(self, backend, max_hot_threads=1000, fsync="interval", fsync_interval=1.0, max_pending=10_000):
+        """
+        backend: AioSqliteBackend(path) or FileBackend(directory)
+        max_hot_threads: how many threads to keep in memory (LRU)
+        fsync: "batch" (after every batch), "interval" (every fsync_interval seconds) or "never" (leave it to the OS)
+        max_pending: past this many queued records writers wait for the flush - and get its error if the disk is failing
+        """
+        super().__init__()
+        self.backend = backend
+        self.front = InMemorySaver(serde=self.serde)
+        self.max_hot_threads = max_hot_threads
+        self.fsync = fsync
+        self.fsync_interval = fsync_interval
+        self.max_pending = max_pending
+        self.sync_task = None
+        self.unsynced = False
+
+        self.hot = OrderedDict() # thread_id -> None, in LRU order
+        self.loading = {} # thread_id -> Task, so concurrent readers share one load
+        self.pending = []
+        self.dirty = set() # threads with writes not on disk yet - never evicted
+        self.pins = {} # thread_id -> calls currently using it - never evicted
+        self.flush_scheduled = False
+        self.flush_task = None
+
+    async def __aenter__(self):
+        await self.backend.open(self.fsync)
+        if self.fsync == "interval":
+            self.sync_task = asyncio.create_task(self._sync_loop())
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    async def aclose(self):
+        if self.sync_task:
+            self.sync_task.cancel()
+        await self.flush()
+        if self.fsync != "never":
+            await self.backend.sync()
+        await self.backend.close()
+
+    # ------ hot thread LRU ------
+
+    @asynccontextmanager
+    async def _using(self, thread_id):
+        """Make sure the thread is in memory, and keep it there until the caller is done with it"""
+        self.pins[thread_id] = self.pins.get(thread_id, 0) + 1
+        try:
+            # Loop - another thread's load or flush may have run _evict while we were waiting
+            while thread_id not in self.hot:
+                if thread_id not in self.loading:
+                    self.loading[thread_id] = asyncio.create_task(self._load(thread_id))
+                await self.loading[thread_id]
+            self.hot.move_to_end(thread_id)
+            yield
+        finally:
+            self.pins[thread_id] -= 1
+            if not self.pins[thread_id]:
+                del self.pins[thread_id]
+
+    async def _load(self, thread_id):
+        try:
+            for record in await self.backend.load(thread_id):
+                self._apply(record)
+            self.hot[thread_id] = None
+            self._evict()
+        finally:
+            del self.loading[thread_id]
+
+    def _apply(self, record):
+        """Put a stored record straight back into the in-memory saver - no re-serializing"""
+        kind, thread_id, ns = record[:3]
+        if kind == "checkpoint":
+            _, _, _, checkpoint_id, parent_id, checkpoint, metadata = record
+            self.front.storage[thread_id][ns][checkpoint_id] = (checkpoint, metadata, parent_id)
+        elif kind == "blob":
+            _, _, _, channel, version, value = record
+            self.front.blobs[(thread_id, ns, channel, version)] = value
+        else:
+            _, _, _, checkpoint_id, task_id, idx, channel, value, task_path = record
+            self.front.writes[(thread_id, ns, checkpoint_id)][(task_id, idx)] = (task_id, channel, value, task_path)
+
+    def _evict(self):
+        for thread_id in list(self.hot):
+            if len(self.hot) <= self.max_hot_threads:
+                break
+            if thread_id in self.dirty or thread_id in self.pins:
+                continue # still has writes on the way to disk, or a caller is using it right now
+            del self.hot[thread_id]
+            self.front.delete_thread(thread_id)
+
+    # ------ write coalescing ------
+
+    def _enqueue(self, thread_id, records):
+        self.pending.extend(records)
+        self.dirty.add(thread_id)
+        if not self.flush_scheduled:
+            # Run after everything else queued in this loop tick - all those writes share one batch
+            self.flush_scheduled = True
+            asyncio.get_running_loop().call_soon(self._kick)
+
+    def _kick(self):
+        self.flush_scheduled = False
+        if self.flush_task is None or self.flush_task.done():
+            self.flush_task = asyncio.create_task(self._flush_loop())
+            # Failures are logged in _flush_loop and retried with the next flush - flush() still raises them
+            self.flush_task.add_done_callback(lambda task: task.cancelled() or task.exception())
+
+    async def _flush_loop(self):
+        # Anything written while a batch is in flight goes out in the next batch
+        while self.pending:
+            batch, self.pending = self.pending, []
+            flushed = {record[1] for record in batch}
+            try:
+                await self.backend.write(batch)
+            except Exception:
+                # Put it back in front of anything newer - the next flush retries, and the threads stay dirty (in memory)
+                self.pending = batch + self.pending
+                logger.exception("checkpoint flush of %d records failed", len(batch))
+                raise
+
+            self.unsynced = True
+            still_pending = {record[1] for record in self.pending}
+            self.dirty -= flushed - still_pending
+        self._evict()
+
+    async def _sync_loop(self):
+        # A timer, not a check on the next write - an idle process still gets its last writes synced
+        while True:
+            await asyncio.sleep(self.fsync_interval)
+            if self.unsynced:
+                self.unsynced = False
+                try:
+                    await self.backend.sync()
+                except Exception:
+                    self.unsynced = True
+                    logger.exception("checkpoint fsync failed")
+
+    async def _backpressure(self):
+        # Normally a no-op. If the disk is slow or failing, writers wait (or get the error) before anything
+        # more is queued - otherwise pending and the dirty, unevictable threads grow without limit
+        if len(self.pending) > self.max_pending:
+            await self.flush()
+
+    async def flush(self):
+        """Wait until everything written so far is on disk"""
+        while self.pending or (self.flush_task and not self.flush_task.done()):
+            if self.flush_task is None or self.flush_task.done():
+                self._kick()
+            await self.flush_task
+
+    # ------ checkpointer API ------
+
+    async def aget_tuple(self, config):
+        async with self._using(config["configurable"]["thread_id"]):
+            return self.front.get_tuple(config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        # With no config only hot threads are listed - cold ones live on disk until touched
+        if config:
+            async with self._using(config["configurable"]["thread_id"]):
+                items = list(self.front.list(config, filter=filter, before=before, limit=limit))
+        else:
+            items = list(self.front.list(config, filter=filter, before=before, limit=limit))
+        for checkpoint_tuple in items:
+            yield checkpoint_tuple
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        thread_id = config["configurable"]["thread_id"]
+        ns = config["configurable"]["checkpoint_ns"]
+        await self._backpressure()
+        async with self._using(thread_id):
+            saved = self.front.put(config, checkpoint, metadata, new_versions)
+            self._enqueue(thread_id, self._checkpoint_records(thread_id, ns, checkpoint, new_versions))
+        return saved
+
+    def _checkpoint_records(self, thread_id, ns, checkpoint, new_versions):
+        # Reuse what InMemorySaver just serialized rather than serializing twice
+        stored, stored_metadata, parent_id = self.front.storage[thread_id][ns][checkpoint["id"]]
+        records = [("checkpoint", thread_id, ns, checkpoint["id"], parent_id, stored, stored_metadata)]
+        records += [
+            ("blob", thread_id, ns, channel, version, self.front.blobs[(thread_id, ns, channel, version)])
+            for channel, version in new_versions.items()
+        ]
+        return records
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        thread_id = config["configurable"]["thread_id"]
+        ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        await self._backpressure()
+        async with self._using(thread_id):
+            self.front.put_writes(config, writes, task_id, task_path)
+
+            stored = self.front.writes[(thread_id, ns, checkpoint_id)]
+            records = []
+            for idx, (channel, _) in enumerate(writes):
+                inner_key = (task_id, WRITES_IDX_MAP.get(channel, idx))
+                if inner_key in stored:
+                    _, channel, value, path = stored[inner_key]
+                    records.append(("write", thread_id, ns, checkpoint_id, task_id, inner_key[1], channel, value, path))
+            self._enqueue(thread_id, records)
+
+    async def adelete_thread(self, thread_id):
+        await self.flush()
+        self.front.delete_thread(thread_id)
+        self.hot.pop(thread_id, None)
+        self.dirty.discard(thread_id)
+        await self.backend.delete(thread_id)
+
+    def get_next_version(self, current, channel):
+        return self.front.get_next_version(current, channel)
+
+
+# --------------------------------------------
+# Use with the async supervisor (or any graph run with ainvoke / astream)
+# --------------------------------------------
+
+async def main():
+    from langchain_core.messages import HumanMessage
+    from langgraph.graph import MessagesState, StateGraph, START, END
+    from langchain_openai import ChatOpenAI
+
+    model = ChatOpenAI(model="gpt-4o-mini")
+
+    async def call_model(state: MessagesState):
+        return {"messages": [await model.ainvoke(state["messages"])]}
+
+    builder = StateGraph(MessagesState)
+    builder.add_node("conversation", call_model)
+    builder.add_edge(START, "conversation")
+    builder.add_edge("conversation", END)
+
+    # FileBackend("state_db/threads") works the same way
+    async with CoalescingAsyncSaver(AioSqliteBackend("state_db/async.db"), max_hot_threads=500) as memory:
+        graph = builder.compile(checkpointer=memory)
+        config = {"configurable": {"thread_id": "1"}}
+        response = await graph.ainvoke({"messages": [HumanMessage(content="Hi, I'm Lance")]}, config)
+        print(response["messages"][-1].content)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,210 @@
+from langgraph.checkpoint.memory import InMemorySaver
+from collections import OrderedDict, defaultdict
+import os
+import pickle
+import threading
+import zlib
+
+from thread_files import thread_path, unpickle, write_atomic
+
+
+# --------------------------------------------
+# Memory-capped drop-in for InMemorySaver
+# --------------------------------------------
+
+# InMemorySaver keeps every checkpoint of every thread forever - a long running agent service
+# slowly eats all the RAM. This one:
+# - keeps only the last `keep_last` checkpoints per thread (plus the channel blobs they point at)
+# - tracks roughly how many bytes each thread holds and, over `max_threads` / `max_bytes`,
+#   moves the least recently used threads to compressed files on disk
+# - loads a thread back transparently the next time anything touches its thread_id
+#
+# Trade-offs: time travel only reaches back `keep_last` checkpoints, and the disk store is
+# an overflow area, not durability - use a real checkpointer (external-storage.py) for that.
+
+class BoundedMemorySaver(InMemorySaver):
+    def __init__(self, directory="state_db/evicted", keep_last=20, max_threads=1000, max_bytes=256 * 1024 * 1024, compression_level=6):
+        super().__init__()
+        self.directory = directory
+        self.keep_last = keep_last
+        self.max_threads = max_threads
+        self.max_bytes = max_bytes
+        self.compression_level = compression_level
+        os.makedirs(directory, exist_ok=True)
+
+        self.lock = threading.RLock() # sync agents can run threads side by side
+        self.hot = OrderedDict() # thread_id -> bytes held in memory, in LRU order
+        self.total_bytes = 0
+        self.versions = defaultdict(dict) # thread_id -> (ns, checkpoint_id) -> channel_versions
+        self.thread_blobs = defaultdict(set) # thread_id -> keys in self.blobs
+        self.thread_writes = defaultdict(set) # thread_id -> keys in self.writes
+        self.stats = {"evictions": 0, "reloads": 0, "pruned_checkpoints": 0}
+
+    # ------ bookkeeping ------
+
+    def _path(self, thread_id):
+        return thread_path(self.directory, thread_id, ".zpkl")
+
+    def _account(self, thread_id, delta):
+        self.hot[thread_id] = self.hot.get(thread_id, 0) + delta
+        self.total_bytes += delta
+
+    def _touch(self, thread_id):
+        if thread_id not in self.hot:
+            self.hot[thread_id] = 0
+            if os.path.exists(self._path(thread_id)):
+                self._reload(thread_id)
+        self.hot.move_to_end(thread_id)
+
+    # ------ evict / reload ------
+
+    def _drop(self, thread_id):
+        """Take a thread out of memory and hand back everything it held"""
+        payload = {
+            "storage": {ns: dict(checkpoints) for ns, checkpoints in self.storage.pop(thread_id, {}).items()},
+            "blobs": {key: self.blobs.pop(key) for key in self.thread_blobs.pop(thread_id, ()) if key in self.blobs},
+            "writes": {key: self.writes.pop(key) for key in self.thread_writes.pop(thread_id, ()) if key in self.writes},
+            "versions": self.versions.pop(thread_id, {}),
+        }
+        self.total_bytes -= self.hot.pop(thread_id, 0)
+        return payload
+
+    def _evict(self, keep):
+        while len(self.hot) > 1 and (len(self.hot) > self.max_threads or self.total_bytes > self.max_bytes):
+            thread_id = next(iter(self.hot))
+            if thread_id == keep:
+                break
+            write_atomic(self._path(thread_id), zlib.compress(pickle.dumps(self._drop(thread_id)), self.compression_level), fsync=False) # overflow, not durability
+            self.stats["evictions"] += 1
+
+    def _reload(self, thread_id):
+        path = self._path(thread_id)
+        with open(path, "rb") as f:
+            payload = unpickle(zlib.decompress(f.read()))
+        os.remove(path) # memory is the source of truth again
+
+        size = 0
+        for ns, checkpoints in payload["storage"].items():
+            self.storage[thread_id][ns].update(checkpoints)
+            size += sum(len(c[1]) + len(m[1]) for c, m, _ in checkpoints.values())
+        for key, value in payload["blobs"].items():
+            self.blobs[key] = value
+            self.thread_blobs[thread_id].add(key)
+            size += len(value[1])
+        for key, writes in payload["writes"].items():
+            self.writes[key] = writes
+            self.thread_writes[thread_id].add(key)
+            size += sum(len(w[2][1]) for w in writes.values())
+        self.versions[thread_id] = payload["versions"]
+        self._account(thread_id, size)
+        self.stats["reloads"] += 1
+
+    # ------ pruning ------
+
+    def _prune(self, thread_id, ns):
+        checkpoints = self.storage[thread_id][ns]
+        if len(checkpoints) <= self.keep_last:
+            return
+        # checkpoint ids are time ordered, so sorting gives oldest first
+        freed = 0
+        for checkpoint_id in sorted(checkpoints)[:-self.keep_last]:
+            checkpoint, metadata, _ = checkpoints.pop(checkpoint_id)
+            freed += len(checkpoint[1]) + len(metadata[1])
+            self.versions[thread_id].pop((ns, checkpoint_id), None)
+            writes = self.writes.pop((thread_id, ns, checkpoint_id), None)
+            if writes:
+                self.thread_writes[thread_id].discard((thread_id, ns, checkpoint_id))
+                freed += sum(len(w[2][1]) for w in writes.values())
+            self.stats["pruned_checkpoints"] += 1
+
+        # Blobs are shared between checkpoints - only drop the ones no kept checkpoint points at
+        live = {
+            (channel, version)
+            for (blob_ns, _), versions in self.versions[thread_id].items() if blob_ns == ns
+            for channel, version in versions.items()
+        }
+        for key in [k for k in self.thread_blobs[thread_id] if k[1] == ns and (k[2], k[3]) not in live]:
+            freed += len(self.blobs.pop(key)[1])
+            self.thread_blobs[thread_id].discard(key)
+        self._account(thread_id, -freed)
+
+    # ------ checkpointer API (the async versions in InMemorySaver call these) ------
+
+    def get_tuple(self, config):
+        with self.lock:
+            self._touch(config["configurable"]["thread_id"])
+            return super().get_tuple(config)
+
+    def list(self, config, *, filter=None, before=None, limit=None):
+        # With no config only in-memory threads are listed
+        with self.lock:
+            if config:
+                self._touch(config["configurable"]["thread_id"])
+            items = list(super().list(config, filter=filter, before=before, limit=limit))
+        yield from items
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        thread_id = config["configurable"]["thread_id"]
+        ns = config["configurable"]["checkpoint_ns"]
+        with self.lock:
+            self._touch(thread_id)
+            blob_keys = [(thread_id, ns, channel, version) for channel, version in new_versions.items()]
+            before = sum(len(self.blobs[k][1]) for k in blob_keys if k in self.blobs)
+
+            saved = super().put(config, checkpoint, metadata, new_versions)
+
+            stored, stored_metadata, _ = self.storage[thread_id][ns][checkpoint["id"]]
+            after = sum(len(self.blobs[k][1]) for k in blob_keys) + len(stored[1]) + len(stored_metadata[1])
+            self.thread_blobs[thread_id].update(blob_keys)
+            self.versions[thread_id][(ns, checkpoint["id"])] = dict(checkpoint["channel_versions"])
+            self._account(thread_id, after - before)
+
+            self._prune(thread_id, ns)
+            self._evict(keep=thread_id)
+            return saved
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        thread_id = config["configurable"]["thread_id"]
+        key = (thread_id, config["configurable"].get("checkpoint_ns", ""), config["configurable"]["checkpoint_id"])
+        with self.lock:
+            self._touch(thread_id)
+            before = sum(len(w[2][1]) for w in self.writes.get(key, {}).values())
+            super().put_writes(config, writes, task_id, task_path)
+            after = sum(len(w[2][1]) for w in self.writes.get(key, {}).values())
+            self.thread_writes[thread_id].add(key)
+            self._account(thread_id, after - before)
+
+    def delete_thread(self, thread_id):
+        with self.lock:
+            self._drop(thread_id)
+            if os.path.exists(self._path(thread_id)):
+                os.remove(self._path(thread_id))
+
+
+# --------------------------------------------
+# Swap it in anywhere InMemorySaver is used
+# --------------------------------------------
+
+if __name__ == "__main__":
+    from langchain_core.messages import AIMessage, HumanMessage
+    from langgraph.graph import MessagesState, StateGraph, START, END
+
+    def echo(state: MessagesState):
+        return {"messages": [AIMessage(content=f"You said: {state['messages'][-1].content}")]}
+
+    builder = StateGraph(MessagesState)
+    builder.add_node("echo", echo)
+    builder.add_edge(START, "echo")
+    builder.add_edge("echo", END)
+
+    memory = BoundedMemorySaver(keep_last=5, max_threads=10)
+    graph = builder.compile(checkpointer=memory)
+
+    # 50 users, 10 turns each - only 10 threads and 5 checkpoints per thread ever sit in memory
+    for turn in range(10):
+        for user in range(50):
+            graph.invoke({"messages": [HumanMessage(content=f"turn {turn}")]}, {"configurable": {"thread_id": f"user-{user}"}})
+
+    state = graph.get_state({"configurable": {"thread_id": "user-0"}}) # comes back from disk
+    print(len(state.values["messages"]), "messages for user-0")
+    print(memory.stats, f"{memory.total_bytes / 1024:.0f} KiB in memory")
@@ -0,0 +1,143 @@
+from langchain_core.messages import AIMessage, AnyMessage, HumanMessage, RemoveMessage, ToolMessage
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+from langgraph.graph import StateGraph, START, END
+from langgraph.graph.message import add_messages
+from typing import Annotated
+from typing_extensions import TypedDict
+import time
+
+
+# --------------------------------------------
+# Bulk pruning of message history
+# --------------------------------------------
+
+# filter_messages (trim-filter.py), summarize_conversation (summary.py) and the trim_messages
+# middleware (middleware-summary.py) all return one RemoveMessage per deleted message.
+# On a long history that's thousands of message objects built, written to the checkpoint,
+# and then matched one by one by the reducer.
+#
+# Instead send ONE instruction - "keep the last N" or "remove this set of ids" - and let the
+# reducer apply it in a single pass. Same trick langgraph uses for REMOVE_ALL_MESSAGES:
+# it's still a RemoveMessage, so it serializes like any other message.
+
+PRUNE = "__prune__"
+
+def keep_last(n: int) -> RemoveMessage:
+    return RemoveMessage(id=PRUNE, additional_kwargs={"keep_last": n})
+
+def remove_ids(ids) -> RemoveMessage:
+    return RemoveMessage(id=PRUNE, additional_kwargs={"ids": list(ids)})
+
+def is_prune(message) -> bool:
+    return isinstance(message, RemoveMessage) and message.id == PRUNE
+
+
+def prune_messages(left, right):
+    """add_messages, plus one-shot prune instructions. Everything else is handed to add_messages untouched."""
+    if not isinstance(right, list):
+        right = [right]
+    if not any(is_prune(m) for m in right):
+        return add_messages(left, right)
+
+    merged = list(left) if isinstance(left, list) else [left]
+    pending = []
+    for message in right:
+        if not is_prune(message):
+            pending.append(message)
+            continue
+        # Apply in order - messages that came before the prune get pruned too
+        if pending:
+            merged = add_messages(merged, pending)
+            pending = []
+        options = message.additional_kwargs
+        if "keep_last" in options:
+            n = options["keep_last"]
+            merged = merged[-n:] if n > 0 else []
+        else:
+            # One set lookup per message - no per-id scan
+            doomed = set(options["ids"])
+            merged = [m for m in merged if m.id not in doomed]
+    return add_messages(merged, pending) if pending else merged
+
+
+class PrunableState(TypedDict):
+    messages: Annotated[list[AnyMessage], prune_messages]
+
+
+# --------------------------------------------
+# The examples, rewritten
+# --------------------------------------------
+
+# filter_messages (trim-filter.py) / summarize_conversation (summary.py)
+def filter_messages(state: PrunableState):
+    # Delete all but the 2 most recent messages
+    return {"messages": [keep_last(2)]}
+
+# trim_messages middleware (middleware-summary.py) - use a state_schema whose messages key uses prune_messages:
+#
+# class PrunableAgentState(AgentState):
+#     messages: Required[Annotated[list[AnyMessage], prune_messages]]
+#
+# @before_agent(state_schema=PrunableAgentState)
+# def trim_messages(state, runtime):
+#     return {"messages": [remove_ids(m.id for m in state["messages"] if isinstance(m, ToolMessage))]}
+
+
+# --------------------------------------------
+# Benchmark - prune cost vs history length
+# --------------------------------------------
+
+def make_history(n):
+    messages = []
+    for i in range(n // 3):
+        messages.append(HumanMessage(content=f"question {i}", id=f"h{i}"))
+        messages.append(AIMessage(content="", id=f"a{i}", tool_calls=[{"name": "search", "args": {"q": str(i)}, "id": f"c{i}"}]))
+        messages.append(ToolMessage(content=f"result {i}", id=f"t{i}", tool_call_id=f"c{i}"))
+    return messages
+
+def timed(fn, repeat=5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+def benchmark(lengths=(300, 3_000, 30_000)):
+    serde = JsonPlusSerializer()
+    print(f"{'messages':>9} | {'case':<22} | {'per-message ms':>14} | {'bulk ms':>8} | {'per-message bytes':>17} | {'bulk bytes':>10}")
+    for n in lengths:
+        history = make_history(n)
+        cases = {
+            # filter_messages / summarize_conversation: everything but the last 2
+            "keep last 2": (
+                lambda: [RemoveMessage(id=m.id) for m in history[:-2]],
+                lambda: [keep_last(2)],
+            ),
+            # middleware-summary.py: every tool message
+            "remove tool messages": (
+                lambda: [RemoveMessage(id=m.id) for m in history if isinstance(m, ToolMessage)],
+                lambda: [remove_ids(m.id for m in history if isinstance(m, ToolMessage))],
+            ),
+        }
+        for name, (per_message, bulk) in cases.items():
+            # Time building the update AND applying it - the node pays for both
+            old = timed(lambda: add_messages(history, per_message()))
+            new = timed(lambda: prune_messages(history, bulk()))
+            assert [m.id for m in add_messages(history, per_message())] == [m.id for m in prune_messages(history, bulk())]
+            # What the checkpointer has to write for the update
+            old_bytes = len(serde.dumps_typed(per_message())[1])
+            new_bytes = len(serde.dumps_typed(bulk())[1])
+            print(f"{n:>9} | {name:<22} | {old:>14.2f} | {new:>8.2f} | {old_bytes:>17} | {new_bytes:>10}")
+
+
+if __name__ == "__main__":
+    # Same filter graph as trim-filter.py, minus the LLM
+    builder = StateGraph(PrunableState)
+    builder.add_node("filter", filter_messages)
+    builder.add_edge(START, "filter")
+    builder.add_edge("filter", END)
+    graph = builder.compile()
+    print([m.id for m in graph.invoke({"messages": make_history(9)})["messages"]])
+
+    benchmark()
@@ -26,6 +26,8 @@ class DefaultState(TypedDict):
 class CustomReducerState(TypedDict):
     foo: Annotated[list[int], reduce_list]
 
+# Both copy the whole list on every step - for keys that grow over long runs see persistent-reducers.py
+
 
 
 # --------------------------------------------
@@ -4,6 +4,7 @@ from langchain_core.messages import SystemMessage, HumanMessage, RemoveMessage
 from langgraph.graph import END
 
 model = ChatOpenAI(model="gpt-4o",temperature=0)
+summary_model = ChatOpenAI(model="gpt-4o-mini",temperature=0) # summaries don't need the big model
 
 import sqlite3
 # In memory
@@ -11,17 +12,333 @@ import sqlite3
 
 # Actual DB file
 db_path = "state_db/example.db"
-conn = sqlite3.connect(db_path, check_same_thread=False)
 
-# Set up the memory
+# Quick version - one shared connection behind a lock, fine for a demo:
+# conn = sqlite3.connect(db_path, check_same_thread=False)
+# memory = SqliteSaver(conn)
+
 from langgraph.checkpoint.sqlite import SqliteSaver
-memory = SqliteSaver(conn)
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+import threading
+import time
+
+
+# --------------------------------------------
+# Production-ish SQLite checkpointer
+# --------------------------------------------
+
+# What changes vs the plain SqliteSaver:
+# - WAL + synchronous=NORMAL + busy_timeout - readers never block the writer, fewer fsyncs
+# - one read connection per thread (no global lock), a single writer connection
+# - batched commits - several checkpoint/write inserts share one transaction
+#   (reads flush first, so nothing ever reads stale data). A background timer commits any batch older than
+#   flush_interval, so an idle process doesn't sit on the write lock - a crash loses at most that much.
+# - delta checkpoints - unchanged channels are stored as a pointer to the parent, and list channels
+#   (messages!) that only grew store just the new items. A full copy is forced every `snapshot_every` hops.
+# - compact() drops superseded checkpoints per thread and vacuums the file - call it from a maintenance job;
+#   with compact_every set, put() also kicks one off in a background thread (without the vacuum)
+
+class TunedSqliteSaver(SqliteSaver):
+    def __init__(self, path, batch_size=20, flush_interval=0.5, snapshot_every=20, keep_last=50, compact_every=500, max_cached_threads=1000):
+        self.path = path
+        self.local = threading.local()
+        self.write_lock = threading.Lock()
+        self.writer = self._connect()
+        super().__init__(self.writer)
+
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.pending = 0
+        self.first_pending_at = None
+        self.closed = threading.Event()
+        self.flusher = threading.Thread(target=self._flush_loop, daemon=True)
+        self.flusher.start()
+
+        self.snapshot_every = snapshot_every
+        self.keep_last = keep_last
+        self.compact_every = compact_every
+        self.puts_since_compact = 0
+        self.compactor = ThreadPoolExecutor(max_workers=1) # never more than one compaction at a time
+        self.compacting = None
+
+        # Last written list contents per (thread, ns) - what the next delta is computed against
+        self.latest = OrderedDict()
+        self.max_cached_threads = max_cached_threads
+
+    # ------ connections ------
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL") # WAL makes this safe against corruption, just not the last few commits
+        conn.execute("PRAGMA busy_timeout=30000")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA cache_size=-20000") # ~20MB page cache
+        return conn
+
+    @property
+    def conn(self):
+        # SqliteSaver reads through self.conn - hand every thread its own connection
+        if not hasattr(self.local, "conn"):
+            self.local.conn = self._connect()
+        return self.local.conn
+
+    @conn.setter
+    def conn(self, value):
+        pass # SqliteSaver.__init__ assigns this - we manage connections ourselves
+
+    def setup(self):
+        if self.is_setup:
+            return
+        with self.write_lock:
+            if self.is_setup:
+                return
+            # Our table first - SqliteSaver.setup flips is_setup, and nobody may see that before every table exists
+            self.writer.executescript("""
+                CREATE TABLE IF NOT EXISTS checkpoint_channels (
+                    thread_id TEXT NOT NULL,
+                    checkpoint_ns TEXT NOT NULL DEFAULT '',
+                    checkpoint_id TEXT NOT NULL,
+                    channel TEXT NOT NULL,
+                    kind TEXT NOT NULL, -- full | append | same
+                    base_checkpoint_id TEXT,
+                    type TEXT,
+                    value BLOB,
+                    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, channel)
+                );
+            """)
+            SqliteSaver.setup(self) # creates checkpoints / writes tables, then sets is_setup
+
+    @contextmanager
+    def cursor(self, transaction=True):
+        self.setup()
+        if not transaction:
+            # Reads see committed data only - flush our own pending batch first
+            self.flush()
+            cur = self.conn.cursor()
+            try:
+                yield cur
+            finally:
+                cur.close()
+            return
+
+        with self.write_lock:
+            cur = self.writer.cursor()
+            try:
+                yield cur
+            finally:
+                cur.close()
+            self.pending += 1
+            if self.first_pending_at is None:
+                self.first_pending_at = time.monotonic()
+            if self.pending >= self.batch_size or time.monotonic() - self.first_pending_at >= self.flush_interval:
+                self._commit()
+
+    def _commit(self):
+        self.writer.commit()
+        self.pending = 0
+        self.first_pending_at = None
+
+    def flush(self):
+        if self.pending:
+            with self.write_lock:
+                if self.pending:
+                    self._commit()
+
+    def _flush_loop(self):
+        # Without this a batch only commits when the NEXT write arrives - an idle process would keep
+        # the transaction (and SQLite's write lock) open and lose it all on a crash
+        while not self.closed.wait(self.flush_interval / 2):
+            if self.first_pending_at is not None and time.monotonic() - self.first_pending_at >= self.flush_interval:
+                self.flush()
+
+    def close(self):
+        self.closed.set()
+        self.flusher.join()
+        self.compactor.shutdown(wait=True)
+        self.flush()
+        self.writer.close()
+
+    # ------ delta checkpoints ------
+
+    def _channel_rows(self, thread_id, checkpoint_ns, checkpoint_id, parent_id, values, new_versions):
+        previous = self.latest.get((thread_id, checkpoint_ns))
+        parent_values = previous[1] if previous and previous[0] == parent_id else {}
+
+        rows = []
+        cached = {}
+        for channel, value in values.items():
+            # Lists are cached as a copy - channels like Topic(accumulate=True) grow the same list object in place,
+            # so the live object would always look "unchanged". Other values only need the version check.
+            snapshot = tuple(value) if isinstance(value, list) else None
+            prev = parent_values.get(channel)
+            if prev is not None and prev[1] < self.snapshot_every:
+                prev_items, depth = prev
+                if channel not in new_versions:
+                    rows.append((channel, "same", parent_id, None, None))
+                    cached[channel] = prev_items, depth + 1
+                    continue
+                if snapshot is not None and prev_items is not None and len(snapshot) >= len(prev_items) \
+                        and all(a is b or a == b for a, b in zip(prev_items, snapshot)):
+                    # Only new messages get written, not the whole history again
+                    rows.append((channel, "append", parent_id, *self.serde.dumps_typed(value[len(prev_items):])))
+                    cached[channel] = (snapshot, depth + 1)
+                    continue
+            rows.append((channel, "full", None, *self.serde.dumps_typed(value)))
+            cached[channel] = (snapshot, 0)
+
+        self.latest[(thread_id, checkpoint_ns)] = (checkpoint_id, cached)
+        self.latest.move_to_end((thread_id, checkpoint_ns))
+        if len(self.latest) > self.max_cached_threads:
+            self.latest.popitem(last=False)
+        return rows
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        thread_id = str(config["configurable"]["thread_id"])
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+        parent_id = config["configurable"].get("checkpoint_id")
+
+        # Channel rows go in first, so anyone who can see the checkpoint row can also rebuild its values
+        with self.cursor() as cur:
+            # Under the write lock - self.latest is shared by every thread writing through this saver
+            rows = self._channel_rows(thread_id, checkpoint_ns, checkpoint["id"], parent_id, checkpoint["channel_values"], new_versions)
+            cur.executemany(
+                "INSERT OR REPLACE INTO checkpoint_channels VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [(thread_id, checkpoint_ns, checkpoint["id"], *row) for row in rows],
+            )
+        # The rest of the checkpoint is stored as usual, minus the values
+        saved = super().put(config, {**checkpoint, "channel_values": {}}, metadata, new_versions)
+
+        self.puts_since_compact += 1
+        if self.compact_every and self.puts_since_compact >= self.compact_every and (self.compacting is None or self.compacting.done()):
+            # A pass over every thread in the file - not something to make this user's request wait for
+            self.puts_since_compact = 0
+            self.compacting = self.compactor.submit(self.compact, keep_last=self.keep_last, vacuum=False)
+        return saved
+
+    def _load_channel(self, cur, thread_id, checkpoint_ns, channel, row):
+        kind, base, type_, value = row
+        suffixes = []
+        while kind != "full":
+            if kind == "append":
+                suffixes.append(self.serde.loads_typed((type_, value)))
+            cur.execute(
+                "SELECT kind, base_checkpoint_id, type, value FROM checkpoint_channels WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? AND channel = ?",
+                (thread_id, checkpoint_ns, base, channel),
+            )
+            found = cur.fetchone()
+            if found is None:
+                raise ValueError(f"Broken delta chain for {channel} at checkpoint {base}")
+            kind, base, type_, value = found
+
+        result = self.serde.loads_typed((type_, value))
+        if suffixes:
+            result = list(result)
+            for suffix in reversed(suffixes):
+                result.extend(suffix)
+        return result
+
+    def _load_channels(self, thread_id, checkpoint_ns, checkpoint_id):
+        with self.cursor(transaction=False) as cur:
+            cur.execute(
+                "SELECT channel, kind, base_checkpoint_id, type, value FROM checkpoint_channels WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                (thread_id, checkpoint_ns, checkpoint_id),
+            )
+            rows = cur.fetchall()
+            return {channel: self._load_channel(cur, thread_id, checkpoint_ns, channel, row) for channel, *row in rows}
+
+    def _hydrate(self, checkpoint_tuple):
+        configurable = checkpoint_tuple.config["configurable"]
+        values = self._load_channels(str(configurable["thread_id"]), configurable.get("checkpoint_ns", ""), configurable["checkpoint_id"])
+        # Older rows written by the plain SqliteSaver still carry their values inline
+        checkpoint_tuple.checkpoint["channel_values"] = {**checkpoint_tuple.checkpoint["channel_values"], **values}
+        return checkpoint_tuple
+
+    def get_tuple(self, config):
+        checkpoint_tuple = super().get_tuple(config)
+        return self._hydrate(checkpoint_tuple) if checkpoint_tuple else None
+
+    def list(self, config, *, filter=None, before=None, limit=None):
+        # Materialize first - the base generator holds a read cursor open while yielding
+        for checkpoint_tuple in list(super().list(config, filter=filter, before=before, limit=limit)):
+            yield self._hydrate(checkpoint_tuple)
+
+    def delete_thread(self, thread_id):
+        super().delete_thread(thread_id)
+        with self.cursor() as cur:
+            cur.execute("DELETE FROM checkpoint_channels WHERE thread_id = ?", (str(thread_id),))
+            for key in [k for k in self.latest if k[0] == str(thread_id)]:
+                del self.latest[key]
+
+    # ------ compaction ------
+
+    def compact(self, keep_last=50, vacuum=True):
+        """Keep only the newest `keep_last` checkpoints per thread, then reclaim the space"""
+        self.flush()
+        with self.cursor(transaction=False) as cur:
+            cur.execute("SELECT DISTINCT thread_id, checkpoint_ns FROM checkpoints")
+            threads = cur.fetchall()
+
+        for thread_id, checkpoint_ns in threads:
+            with self.cursor(transaction=False) as cur:
+                cur.execute(
+                    "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? ORDER BY checkpoint_id DESC",
+                    (thread_id, checkpoint_ns),
+                )
+                ids = [row[0] for row in cur.fetchall()]
+            if len(ids) <= keep_last:
+                continue
+            keep, drop = set(ids[:keep_last]), ids[keep_last:]
+
+            # Survivors whose delta chain reaches into a dropped checkpoint get rewritten as full copies
+            with self.cursor(transaction=False) as cur:
+                cur.execute(
+                    f"SELECT DISTINCT checkpoint_id FROM checkpoint_channels WHERE thread_id = ? AND checkpoint_ns = ? AND base_checkpoint_id IN ({','.join('?' * len(drop))})",
+                    (thread_id, checkpoint_ns, *drop),
+                )
+                orphaned = sorted(row[0] for row in cur.fetchall() if row[0] in keep)
+            materialized = {checkpoint_id: self._load_channels(thread_id, checkpoint_ns, checkpoint_id) for checkpoint_id in orphaned}
+
+            with self.write_lock:
+                cur = self.writer.cursor()
+                for checkpoint_id, values in materialized.items():
+                    cur.executemany(
+                        "INSERT OR REPLACE INTO checkpoint_channels VALUES (?, ?, ?, ?, 'full', NULL, ?, ?)",
+                        [(thread_id, checkpoint_ns, checkpoint_id, channel, *self.serde.dumps_typed(value)) for channel, value in values.items()],
+                    )
+                for table in ["checkpoints", "writes", "checkpoint_channels"]:
+                    cur.executemany(
+                        f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                        [(thread_id, checkpoint_ns, checkpoint_id) for checkpoint_id in drop],
+                    )
+                cur.close()
+                self._commit()
+
+        if vacuum:
+            with self.write_lock:
+                self._commit()
+                self.writer.execute("VACUUM")
+                self.writer.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+
+# Every read of a thread - invoke, stream, get_state, update_state, whoever calls them - first waits
+# for that thread's background summary (wait_for_summary below)
+class SummaryAwareSaver(TunedSqliteSaver):
+    def get_tuple(self, config):
+        wait_for_summary(config)
+        return super().get_tuple(config)
+
+# Set up the memory
+memory = SummaryAwareSaver(db_path)
 
 
 # Everything else is the same as our typical summary chatbot setup
 
 class State(MessagesState):
     summary: str
+    summarized_until: str # id of the last message already folded into the summary
 
 
 
@@ -52,6 +369,12 @@ def summarize_conversation(state: State):
     # First, we get any existing summary
     summary = state.get("summary", "")
 
+    # Only send what the summary hasn't seen yet - the summary itself carries the rest
+    messages = state["messages"]
+    ids = [m.id for m in messages]
+    seen = state.get("summarized_until")
+    new_messages = messages[ids.index(seen) + 1:] if seen in ids else messages
+
     # Create our summarization prompt 
     if summary:
         
@@ -64,27 +387,19 @@ def summarize_conversation(state: State):
     else:
         summary_message = "Create a summary of the conversation above:"
 
-    # Add prompt to our history
-    messages = state["messages"] + [HumanMessage(content=summary_message)]
-    response = model.invoke(messages)
+    # Add prompt to the new messages
+    response = summary_model.invoke(new_messages + [HumanMessage(content=summary_message)])
     
     # Delete all but the 2 most recent messages
-    delete_messages = [RemoveMessage(id=m.id) for m in state["messages"][:-2]]
-    return {"summary": response.content, "messages": delete_messages}
+    delete_messages = [RemoveMessage(id=m.id) for m in messages[:-2]]
+    return {"summary": response.content, "summarized_until": messages[-1].id, "messages": delete_messages}
 
 
 
-# Determine whether to end or summarize the conversation
-def should_continue(state: State):
-    """Return the next node to execute."""
-    messages = state["messages"]
-    
+# Determine whether the conversation needs summarizing
+def needs_summary(state: State):
     # If there are more than six messages, then we summarize the conversation
-    if len(messages) > 6:
-        return "summarize_conversation"
-    
-    # Otherwise we can just end - returning the model response
-    return END
+    return len(state["messages"]) > 6
 
 
 from langgraph.checkpoint.memory import MemorySaver
@@ -96,9 +411,53 @@ workflow.add_node("conversation", call_model)
 workflow.add_node(summarize_conversation)
 
 # Set the entrypoint as conversation
+# The reply always ends the run - summarizing happens after the user already has their answer
 workflow.add_edge(START, "conversation")
-workflow.add_conditional_edges("conversation", should_continue)
+workflow.add_edge("conversation", END)
 workflow.add_edge("summarize_conversation", END)
 
 # Compile
-graph = workflow.compile(checkpointer=memory)
\ No newline at end of file
+graph = workflow.compile(checkpointer=memory)
+
+
+# --------------------------------------------
+# Summarize off the critical path
+# --------------------------------------------
+
+summarizer = ThreadPoolExecutor(max_workers=4)
+summarizing = {} # thread_id -> Future of the summary running for it
+summary_worker = threading.local() # set while a summary runs - its own reads mustn't wait for itself
+
+def wait_for_summary(config):
+    # A turn must start from the summarized state, otherwise it would overwrite it.
+    # Almost always already done - people take longer to read and type than the small model takes to summarize.
+    if getattr(summary_worker, "active", False):
+        return
+    thread_id = config["configurable"]["thread_id"]
+    pending = summarizing.get(thread_id)
+    if pending:
+        try:
+            pending.result()
+        finally:
+            if summarizing.get(thread_id) is pending:
+                summarizing.pop(thread_id, None)
+
+def summarize_thread(config):
+    summary_worker.active = True
+    try:
+        state = graph.get_state(config).values
+        if needs_summary(state):
+            # Merge into the latest checkpoint as if the summarize node had run
+            graph.update_state(config, summarize_conversation(state), as_node="summarize_conversation")
+    finally:
+        summary_worker.active = False
+
+def chat(message, config):
+    # No need to wait for the last summary here - the checkpointer does that on every read of the thread
+    response = graph.invoke({"messages": [HumanMessage(content=message)]}, config)
+    if needs_summary(response):
+        summarizing[config["configurable"]["thread_id"]] = summarizer.submit(summarize_thread, config)
+    return response
+
+# config = {"configurable": {"thread_id": "1"}}
+# chat("hi! I'm Lance", config)["messages"][-1].pretty_print()
@@ -0,0 +1,321 @@
+from collections import OrderedDict
+from collections.abc import Sequence
+from itertools import chain, islice
+from typing import Annotated
+from typing_extensions import TypedDict
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+import hashlib
+import ormsgpack
+import os
+import time
+
+
+# --------------------------------------------
+# Reducers that don't copy the whole list every step
+# --------------------------------------------
+
+# reduce_list (custom-reducer.py) and operator.add both return left + right - every super-step
+# copies everything accumulated so far, so a key that grows by one item per step costs O(n²) over a run.
+#
+# ChunkedList is an immutable list made of fixed size chunks. Appending copies only the
+# small tail chunk and the (short) tuple of chunk pointers - every full chunk is shared
+# between the old and new value in memory.
+#
+# With a checkpointer you MUST use ChunkedSerde (with_chunked_serde(saver) below) - the default
+# serializer raises "Type is not msgpack serializable" on a ChunkedList. ChunkedSerde stores each
+# full chunk once, under a hash of its content, and a checkpoint holds only the hashes plus the tail.
+#
+# Reducers below:
+#   append_chunked          - replaces reduce_list (needs ChunkedSerde once checkpointed)
+#   capped(n)               - chunked, keeps at least the last n items (drops whole old chunks)
+#   windowed(n)             - exactly the last n items (small n - it's a plain tuple slice)
+#   dedup_by_key(key)       - chunked, skips items whose key was already seen
+
+CHUNK_SIZE = 256
+
+
+class ChunkedList(Sequence):
+    __slots__ = ("chunks", "tail", "length", "start")
+
+    def __init__(self, chunks=(), tail=(), start=0):
+        self.chunks = chunks # tuple of full chunks (tuples of CHUNK_SIZE items), shared between versions
+        self.tail = tail # last, partially filled chunk
+        self.start = start # items dropped from the front of chunks[0] (capped lists)
+        self.length = len(chunks) * CHUNK_SIZE + len(tail) - start
+
+    @classmethod
+    def of(cls, items):
+        return items if isinstance(items, ChunkedList) else cls().extend(items)
+
+    def extend(self, items):
+        """Return a new list with items on the end - self is never modified"""
+        tail = self.tail + tuple(items)
+        if len(tail) < CHUNK_SIZE:
+            return ChunkedList(self.chunks, tail, self.start)
+        cut = len(tail) - len(tail) % CHUNK_SIZE
+        full = tuple(tail[i:i + CHUNK_SIZE] for i in range(0, cut, CHUNK_SIZE))
+        return ChunkedList(self.chunks + full, tail[cut:], self.start)
+
+    def drop_front(self, keep):
+        """Keep at least the last `keep` items, dropping whole chunks only"""
+        result = self
+        while result.chunks and result.length - (CHUNK_SIZE - result.start) >= keep:
+            result = ChunkedList(result.chunks[1:], result.tail, 0)
+        return result
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        items = chain(chain.from_iterable(self.chunks), self.tail)
+        return islice(items, self.start, None) if self.start else items
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(self)[index]
+        if index < 0:
+            index += self.length
+        if not 0 <= index < self.length:
+            raise IndexError("ChunkedList index out of range")
+        index += self.start
+        chunk, offset = divmod(index, CHUNK_SIZE)
+        return self.chunks[chunk][offset] if chunk < len(self.chunks) else self.tail[offset]
+
+    def __eq__(self, other):
+        return isinstance(other, Sequence) and len(self) == len(other) and all(a == b for a, b in zip(self, other))
+
+    def __repr__(self):
+        return f"ChunkedList({list(self)!r})"
+
+
+# --------------------------------------------
+# Reducers
+# --------------------------------------------
+
+def append_chunked(left, right):
+    """Same contract as reduce_list - None on either side is treated as empty.
+    Checkpointed graphs need ChunkedSerde - see with_chunked_serde"""
+    left = ChunkedList.of(left or ())
+    return left.extend(right) if right else left
+
+
+def capped(max_items):
+    def reducer(left, right):
+        return append_chunked(left, right).drop_front(max_items)
+    return reducer
+
+
+def windowed(size):
+    def reducer(left, right):
+        # Copies at most `size` items - fine for small windows
+        return (tuple(left or ()) + tuple(right or ()))[-size:]
+    return reducer
+
+
+class KeyedChunkedList(ChunkedList):
+    """ChunkedList plus a set of keys already in it.
+
+    The key index is shared with the version it was extended from. Only the newest version
+    (the one whose length matches the index) extends it in place - extending an older
+    version (time travel / fork) rebuilds the index first, so versions never see each other's keys.
+    """
+    __slots__ = ("index",)
+
+    def __init__(self, chunks=(), tail=(), start=0, index=None):
+        super().__init__(chunks, tail, start)
+        self.index = index
+
+    def extend_keyed(self, items, key):
+        index = self.index
+        if index is None or index["length"] != self.length:
+            index = {"length": self.length, "keys": {key(item) for item in self}}
+        new = []
+        for item in items:
+            k = key(item)
+            if k not in index["keys"]:
+                index["keys"].add(k)
+                new.append(item)
+        grown = self.extend(new)
+        index["length"] = grown.length
+        return KeyedChunkedList(grown.chunks, grown.tail, grown.start, index)
+
+
+def dedup_by_key(key):
+    def reducer(left, right):
+        if not isinstance(left, KeyedChunkedList):
+            left = KeyedChunkedList().extend_keyed(left or (), key)
+        return left.extend_keyed(right or (), key)
+    return reducer
+
+
+# --------------------------------------------
+# Checkpointing - store each full chunk once
+# --------------------------------------------
+
+# The default serializer doesn't know ChunkedList, and even if it did it would write every chunk
+# into every checkpoint - the same O(n²) bytes as reduce_list. ChunkedSerde writes each full chunk
+# ONCE into a chunk store, keyed by a hash of its encoded bytes; the checkpoint blob is just
+# [start, [hash, ...], tail] - 32 hex chars per chunk instead of the chunk.
+#
+# The chunk store lives beside the checkpointer:
+#   - a dict (the default) for InMemorySaver - gone on restart, like the checkpoints
+#   - FileChunkStore(directory) for a saver that outlives the process (SqliteSaver, async-storage.py)
+# Chunks are never deleted - they're shared between threads and checkpoints, and nothing counts
+# references. Deleting a thread leaves its chunks behind; wipe the store along with the checkpoints.
+
+class FileChunkStore:
+    """hash -> encoded chunk, one small file per chunk. Chunks never change, so no locking needed."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def __contains__(self, key):
+        return os.path.exists(self._path(key))
+
+    def __getitem__(self, key):
+        with open(self._path(key), "rb") as f:
+            return f.read()
+
+    def __setitem__(self, key, data):
+        tmp = f"{self._path(key)}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, self._path(key)) # same key = same bytes, so a race just writes it twice
+
+
+class ChunkedSerde(JsonPlusSerializer):
+    def __init__(self, store=None, max_cached_chunks=10_000, **kwargs):
+        super().__init__(**kwargs)
+        self.store = {} if store is None else store
+        self.hashes = OrderedDict() # id(chunk) -> (chunk, hash) - holding the chunk keeps the id valid
+        self.decoded = OrderedDict() # hash -> chunk, so checkpoints loaded back share their chunks again
+        self.max_cached_chunks = max_cached_chunks
+
+    def _remember(self, cache, key, value):
+        cache[key] = value
+        if len(cache) > self.max_cached_chunks:
+            cache.popitem(last=False)
+
+    def _store_chunk(self, chunk):
+        hit = self.hashes.get(id(chunk))
+        if hit is not None and hit[0] is chunk:
+            return hit[1]
+        _, data = super().dumps_typed(list(chunk))
+        key = hashlib.blake2b(data, digest_size=16).hexdigest()
+        if key not in self.store:
+            self.store[key] = data
+        self._remember(self.hashes, id(chunk), (chunk, key))
+        return key
+
+    def _load_chunk(self, key):
+        chunk = self.decoded.get(key)
+        if chunk is None:
+            chunk = tuple(super().loads_typed(("msgpack", self.store[key])))
+            self._remember(self.decoded, key, chunk)
+            self._remember(self.hashes, id(chunk), (chunk, key))
+        return chunk
+
+    def dumps_typed(self, obj):
+        if not isinstance(obj, ChunkedList):
+            return super().dumps_typed(obj)
+        keys = [self._store_chunk(chunk) for chunk in obj.chunks]
+        return "chunked", ormsgpack.packb([obj.start, keys, super().dumps_typed(list(obj.tail))[1]])
+
+    def loads_typed(self, data):
+        type_, payload = data
+        if type_ != "chunked":
+            return super().loads_typed(data)
+        start, keys, tail = ormsgpack.unpackb(payload)
+        chunks = tuple(self._load_chunk(key) for key in keys)
+        return ChunkedList(chunks, tuple(super().loads_typed(("msgpack", tail))), start)
+
+
+def with_chunked_serde(saver, store=None):
+    """Switch a checkpointer over to ChunkedSerde - before it writes its first checkpoint.
+    with_chunked_serde(InMemorySaver()), with_chunked_serde(SqliteSaver(conn), FileChunkStore("state_db/chunks"))"""
+    saver.serde = ChunkedSerde(store)
+    return saver
+
+
+# --------------------------------------------
+# Use in state
+# --------------------------------------------
+
+class ChunkedState(TypedDict):
+    foo: Annotated[list[int], append_chunked]
+    recent: Annotated[list[int], windowed(10)]
+    seen_urls: Annotated[list[str], dedup_by_key(lambda url: url.lower())]
+
+
+# --------------------------------------------
+# Benchmarks vs reduce_list
+# --------------------------------------------
+
+def reduce_list(left, right):
+    # same as custom-reducer.py
+    if not left:
+        left = []
+    if not right:
+        right = []
+    return left + right
+
+
+def bench_fold(steps):
+    """Just the reducer - what the channel does with each step's write"""
+    results = {}
+    for name, reducer in [("reduce_list", reduce_list), ("append_chunked", append_chunked), ("capped(1000)", capped(1000))]:
+        value = None
+        start = time.perf_counter()
+        for i in range(steps):
+            value = reducer(value, [i])
+        results[name] = time.perf_counter() - start
+    return results
+
+
+def bench_graph(steps, reducer, checkpointer=None):
+    """A real graph: one node appending one item per super-step"""
+    from langgraph.graph import StateGraph, START, END
+
+    class State(TypedDict):
+        items: Annotated[list[int], reducer]
+        count: int
+
+    def step(state: State):
+        return {"items": [state["count"]], "count": state["count"] + 1}
+
+    builder = StateGraph(State)
+    builder.add_node("step", step)
+    builder.add_edge(START, "step")
+    builder.add_conditional_edges("step", lambda state: END if state["count"] >= steps else "step")
+    graph = builder.compile(checkpointer=checkpointer)
+
+    config = {"recursion_limit": steps + 10, "configurable": {"thread_id": "bench"}}
+    start = time.perf_counter()
+    result = graph.invoke({"items": [], "count": 0}, config)
+    assert list(result["items"]) == list(range(steps))
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    from langgraph.checkpoint.memory import InMemorySaver
+
+    print("Reducer only (seconds)")
+    for steps in [10_000, 50_000]:
+        print(f"  {steps:>6} steps:", {name: round(t, 3) for name, t in bench_fold(steps).items()})
+
+    print("Graph, no checkpointer (seconds)")
+    for steps in [10_000, 20_000]:
+        print(f"  {steps:>6} steps: reduce_list {bench_graph(steps, reduce_list):.2f} | append_chunked {bench_graph(steps, append_chunked):.2f}")
+
+    print("Graph, InMemorySaver (seconds, checkpoint bytes)")
+    for steps in [1_000, 5_000]:
+        plain_saver, chunked_saver = InMemorySaver(), with_chunked_serde(InMemorySaver())
+        plain = bench_graph(steps, reduce_list, plain_saver)
+        chunked = bench_graph(steps, append_chunked, chunked_saver)
+        plain_bytes = sum(len(blob[1]) for blob in plain_saver.blobs.values())
+        chunked_bytes = sum(len(blob[1]) for blob in chunked_saver.blobs.values()) + sum(len(data) for data in chunked_saver.serde.store.values())
+        print(f"  {steps:>6} steps: reduce_list {plain:.2f}s {plain_bytes / 1e6:.1f} MB | append_chunked + ChunkedSerde {chunked:.2f}s {chunked_bytes / 1e6:.1f} MB")
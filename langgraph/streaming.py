@@ -0,0 +1,61 @@
+# --------------------------------------------
+# Streaming any compiled graph as UI events
+# --------------------------------------------
+
+# invoke() returns only when the whole graph is done. For a UI stream instead:
+# - "updates": each node's state update the moment that node finishes
+# - "messages": LLM tokens as they're generated, from whichever node is calling the model -
+#   even though the nodes use .invoke(), so the first token shows up no matter how deep the graph is
+# - "custom": whatever nodes send through get_stream_writer() (ParallelToolNode's tool results in ReAct.py)
+#
+# Used by ReAct.py, summary.py and trim-filter.py - import it from a script in this folder:
+# from streaming import stream_graph, astream_graph
+
+import asyncio
+from langchain_core.messages import AIMessageChunk
+
+STREAM_MODES = ["updates", "messages", "custom"]
+
+def to_events(mode, chunk):
+    if mode == "messages":
+        message, metadata = chunk
+        # Whole messages (tool results, user input) come through here too - they're already in the updates
+        if isinstance(message, AIMessageChunk) and message.content:
+            yield {"type": "token", "node": metadata["langgraph_node"], "text": message.content}
+    elif mode == "updates":
+        for node, update in chunk.items():
+            yield {"type": "update", "node": node, "update": update}
+    else:
+        yield {"type": "custom", "data": chunk}
+
+def stream_graph(graph, inputs, config=None):
+    """Sync generator - the graph only moves on when you ask for the next event"""
+    for mode, chunk in graph.stream(inputs, config, stream_mode=STREAM_MODES):
+        yield from to_events(mode, chunk)
+
+async def astream_graph(graph, inputs, config=None, max_buffered=64):
+    """Async iterator. The graph runs in its own task and fills a bounded queue -
+    if the consumer (a websocket, an SSE response) falls behind, the graph waits instead of piling up events"""
+    queue = asyncio.Queue(maxsize=max_buffered)
+
+    async def produce():
+        try:
+            async for mode, chunk in graph.astream(inputs, config, stream_mode=STREAM_MODES):
+                for event in to_events(mode, chunk):
+                    await queue.put(("event", event))
+        except Exception as e:
+            await queue.put(("error", e))
+            return
+        await queue.put(("done", None))
+
+    producer = asyncio.create_task(produce())
+    try:
+        while True:
+            kind, payload = await queue.get()
+            if kind == "done":
+                return
+            if kind == "error":
+                raise payload
+            yield payload
+    finally:
+        producer.cancel() # consumer went away - stop the graph too
@@ -4,9 +4,11 @@ from langchain_core.messages import SystemMessage, HumanMessage, RemoveMessage
 from langgraph.graph import END
 
 model = ChatOpenAI(model="gpt-4o",temperature=0)
+summary_model = ChatOpenAI(model="gpt-4o-mini",temperature=0) # summaries don't need the big model
 
 class State(MessagesState):
     summary: str
+    summarized_until: str # id of the last message already folded into the summary
 
 
 
@@ -37,6 +39,12 @@ def summarize_conversation(state: State):
     # First, we get any existing summary
     summary = state.get("summary", "")
 
+    # Only send what the summary hasn't seen yet - the summary itself carries the rest
+    messages = state["messages"]
+    ids = [m.id for m in messages]
+    seen = state.get("summarized_until")
+    new_messages = messages[ids.index(seen) + 1:] if seen in ids else messages
+
     # Create our summarization prompt 
     if summary:
         
@@ -49,31 +57,26 @@ def summarize_conversation(state: State):
     else:
         summary_message = "Create a summary of the conversation above:"
 
-    # Add prompt to our history
-    messages = state["messages"] + [HumanMessage(content=summary_message)]
-    response = model.invoke(messages)
+    # Add prompt to the new messages
+    response = summary_model.invoke(new_messages + [HumanMessage(content=summary_message)])
     
     # Delete all but the 2 most recent messages
-    delete_messages = [RemoveMessage(id=m.id) for m in state["messages"][:-2]]
-    return {"summary": response.content, "messages": delete_messages}
+    delete_messages = [RemoveMessage(id=m.id) for m in messages[:-2]]
+    return {"summary": response.content, "summarized_until": messages[-1].id, "messages": delete_messages}
 
 
 
-# Determine whether to end or summarize the conversation
-def should_continue(state: State):
-    """Return the next node to execute."""
-    messages = state["messages"]
-    
+# Determine whether the conversation needs summarizing
+def needs_summary(state: State):
     # If there are more than six messages, then we summarize the conversation
-    if len(messages) > 6:
-        return "summarize_conversation"
-    
-    # Otherwise we can just end - returning the model response
-    return END
+    return len(state["messages"]) > 6
 
 
 from langgraph.checkpoint.memory import MemorySaver
 from langgraph.graph import StateGraph, START
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import threading
 
 # Define a new graph
 workflow = StateGraph(State)
@@ -81,10 +84,88 @@ workflow.add_node("conversation", call_model)
 workflow.add_node(summarize_conversation)
 
 # Set the entrypoint as conversation
+# The reply always ends the run - summarizing happens after the user already has their answer
 workflow.add_edge(START, "conversation")
-workflow.add_conditional_edges("conversation", should_continue)
+workflow.add_edge("conversation", END)
 workflow.add_edge("summarize_conversation", END)
 
+# Every read of a thread - invoke, stream, get_state, update_state, whoever calls them - first waits
+# for that thread's background summary (wait_for_summary below)
+class SummaryAwareSaver(MemorySaver):
+    def get_tuple(self, config):
+        wait_for_summary(config)
+        return super().get_tuple(config)
+
+    async def aget_tuple(self, config):
+        await asyncio.to_thread(wait_for_summary, config) # don't block the event loop on it
+        return await super().aget_tuple(config)
+
 # Compile
-memory = MemorySaver()
-graph = workflow.compile(checkpointer=memory)
\ No newline at end of file
+memory = SummaryAwareSaver()
+graph = workflow.compile(checkpointer=memory)
+
+
+# --------------------------------------------
+# Summarize off the critical path
+# --------------------------------------------
+
+summarizer = ThreadPoolExecutor(max_workers=4)
+summarizing = {} # thread_id -> Future of the summary running for it
+summary_worker = threading.local() # set while a summary runs - its own reads mustn't wait for itself
+
+def wait_for_summary(config):
+    # A turn must start from the summarized state, otherwise it would overwrite it.
+    # Almost always already done - people take longer to read and type than the small model takes to summarize.
+    if getattr(summary_worker, "active", False):
+        return
+    thread_id = config["configurable"]["thread_id"]
+    pending = summarizing.get(thread_id)
+    if pending:
+        try:
+            pending.result()
+        finally:
+            if summarizing.get(thread_id) is pending:
+                summarizing.pop(thread_id, None)
+
+def summarize_thread(config):
+    summary_worker.active = True
+    try:
+        state = graph.get_state(config).values
+        if needs_summary(state):
+            # Merge into the latest checkpoint as if the summarize node had run
+            graph.update_state(config, summarize_conversation(state), as_node="summarize_conversation")
+    finally:
+        summary_worker.active = False
+
+def chat(message, config):
+    # No need to wait for the last summary here - the checkpointer does that on every read of the thread
+    response = graph.invoke({"messages": [HumanMessage(content=message)]}, config)
+    if needs_summary(response):
+        summarizing[config["configurable"]["thread_id"]] = summarizer.submit(summarize_thread, config)
+    return response
+
+
+# --------------------------------------------
+# Streaming
+# --------------------------------------------
+
+# Same events as ReAct.py's stream - see streaming.py
+from streaming import stream_graph, astream_graph
+
+def stream_chat(message, config):
+    """chat(), streamed - the summary still runs after the last event, in the background"""
+    yield from stream_graph(graph, {"messages": [HumanMessage(content=message)]}, config)
+    if needs_summary(graph.get_state(config).values):
+        summarizing[config["configurable"]["thread_id"]] = summarizer.submit(summarize_thread, config)
+
+async def astream_chat(message, config):
+    async for event in astream_graph(graph, {"messages": [HumanMessage(content=message)]}, config):
+        yield event
+    if needs_summary((await graph.aget_state(config)).values):
+        summarizing[config["configurable"]["thread_id"]] = summarizer.submit(summarize_thread, config)
+
+# config = {"configurable": {"thread_id": "1"}}
+# chat("hi! I'm Lance", config)["messages"][-1].pretty_print()
+# for event in stream_chat("what's my name?", config):
+#     if event["type"] == "token":
+#         print(event["text"], end="", flush=True)
@@ -0,0 +1,31 @@
+# --------------------------------------------
+# Per-thread files for the checkpointers
+# --------------------------------------------
+
+# Shared by bounded-memory.py (evicted threads) and async-storage.py (FileBackend logs).
+# Import it from a script in this folder: from thread_files import thread_path, write_atomic, unpickle
+
+import os
+import pickle
+
+
+def thread_path(directory, thread_id, suffix):
+    """One file per thread - thread ids can hold anything, file names can't"""
+    safe = "".join(c if c.isalnum() or c in "-_" else "_" for c in str(thread_id))
+    return os.path.join(directory, f"{safe}{suffix}")
+
+
+def write_atomic(path, data, fsync=True):
+    # write-then-rename so a crash never leaves half a file behind
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+        if fsync:
+            f.flush()
+            os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def unpickle(data):
+    # pickle runs code on load - fine here only because these files are written by the savers themselves
+    return pickle.loads(data)
@@ -19,6 +19,7 @@ def filter_messages(state: MessagesState):
     # Delete all but the 2 most recent messages
     delete_messages = [RemoveMessage(id=m.id) for m in state["messages"][:-2]]
     # returns an array of RemoveMessage items - The built-in reducer knows how to handle these
+    # (one per message - on long histories send a single keep_last(2) instead, see bulk-prune.py)
     return {"messages": delete_messages}
 
 def chat_model_node(state: MessagesState):    
@@ -74,4 +75,104 @@ builder = StateGraph(MessagesState)
 builder.add_node("chat_model", chat_model_node)
 builder.add_edge(START, "chat_model")
 builder.add_edge("chat_model", END)
-graph = builder.compile()
\ No newline at end of file
+graph = builder.compile()
+
+# --------------------------------------------
+# Cached trimming
+# --------------------------------------------
+
+# trim_messages above re-counts every message in the history on every turn, and builds a new
+# ChatOpenAI just to count. Messages never change once they're in state, so:
+# - count each message once (cached by id) with one local tiktoken encoding
+# - keep running prefix sums of the token counts per thread - a new turn only adds its new messages
+# - binary search the prefix sums for where the last `max_tokens` start
+# That makes a turn O(new messages + log n) instead of O(all tokens in the history)
+
+import tiktoken
+from bisect import bisect_left
+from collections import OrderedDict
+from langchain_core.messages import HumanMessage
+
+class CachedTrimmer:
+    def __init__(self, max_tokens, model="gpt-4o", start_on_human=True, max_threads=1000):
+        self.max_tokens = max_tokens
+        self.encoding = tiktoken.encoding_for_model(model)
+        self.start_on_human = start_on_human # don't hand the model a history that starts mid tool-call
+        self.counts = {} # message id -> tokens
+        self.threads = OrderedDict() # thread_id -> (message ids, prefix sums)
+        self.max_threads = max_threads
+
+    def count(self, message):
+        if message.id in self.counts:
+            return self.counts[message.id]
+        # Same overhead OpenAI adds per message (role + separators), plus content and any tool calls
+        tokens = 3 + len(self.encoding.encode(message.text))
+        for call in getattr(message, "tool_calls", None) or []:
+            tokens += len(self.encoding.encode(call["name"] + str(call["args"])))
+        if message.id:
+            self.counts[message.id] = tokens
+        return tokens
+
+    def _prefix(self, thread_id, messages):
+        ids, prefix = self.threads.pop(thread_id, ([], [0]))
+        n = len(ids)
+        # Still the same history with new messages on the end? Then only count the new ones
+        if not (n <= len(messages) and (n == 0 or (messages[0].id == ids[0] and messages[n - 1].id == ids[-1]))):
+            for old_id in ids:
+                self.counts.pop(old_id, None) # history was rewritten (trimmed / summarized) - start over
+            ids, prefix, n = [], [0], 0
+        for message in messages[n:]:
+            ids.append(message.id)
+            prefix.append(prefix[-1] + self.count(message))
+
+        self.threads[thread_id] = (ids, prefix)
+        if len(self.threads) > self.max_threads:
+            _, (old_ids, _) = self.threads.popitem(last=False)
+            for old_id in old_ids:
+                self.counts.pop(old_id, None)
+        return prefix
+
+    def trim(self, messages, thread_id="default"):
+        prefix = self._prefix(thread_id, messages)
+        # First index whose suffix fits: prefix[-1] - prefix[i] <= max_tokens
+        start = bisect_left(prefix, prefix[-1] - self.max_tokens)
+        if self.start_on_human:
+            while start < len(messages) and not isinstance(messages[start], HumanMessage):
+                start += 1
+        return messages[start:]
+
+trimmer = CachedTrimmer(max_tokens=100)
+
+# Node
+def chat_model_node(state: MessagesState, config):
+    messages = trimmer.trim(state["messages"], thread_id=config["configurable"].get("thread_id", "default"))
+    return {"messages": [llm.invoke(messages)]}
+
+# Build graph
+builder = StateGraph(MessagesState)
+builder.add_node("chat_model", chat_model_node)
+builder.add_edge(START, "chat_model")
+builder.add_edge("chat_model", END)
+graph = builder.compile()
+
+
+# --------------------------------------------
+# Streaming
+# --------------------------------------------
+
+# Same events as ReAct.py's stream - see streaming.py
+from streaming import stream_graph, astream_graph
+
+def stream_chat(messages, config=None):
+    """Sync - token / update events. No checkpointer here, so pass the whole conversation like invoke()"""
+    yield from stream_graph(graph, {"messages": messages}, config)
+
+async def astream_chat(messages, config=None):
+    """Async - the graph runs ahead into a bounded queue while the consumer catches up"""
+    async for event in astream_graph(graph, {"messages": messages}, config):
+        yield event
+
+# config = {"configurable": {"thread_id": "1"}}
+# for event in stream_chat([HumanMessage(content="Tell me about whales")], config):
+#     if event["type"] == "token":
+#         print(event["text"], end="", flush=True)